@@ -0,0 +1,194 @@
+"""
+Analysis of positions - the score, principal variation and depth of every legal move.
+
+Unlike MyPlayer.move, every root move is searched with the full window, so
+all the scores are exact, not only the score of the best move. The time
+budget is spent by iterative deepening over all the moves; a move keeps the
+result of the deepest iteration that reached it.
+
+Batch mode reads JSON lines positions {"board": [[...]], "side": 0, ...}
+and writes them back with an "analysis" list, positions are analyzed on all
+CPU cores:
+
+>> python analysis.py                                       analyzes the sample board
+>> python analysis.py -t 2 -j 4 -o analyzed.jsonl positions.jsonl
+
+Options:
+    -t SECONDS   budget of one position (default 1)
+    -j N         number of worker processes (default all cores)
+    -o FILE      output file (default standard output)
+"""
+import collections
+import getopt
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import player
+from bitboard import popcount
+
+BUDGET = 1.0
+# positions handed out to every worker ahead of the results read
+QUEUED = 2
+
+
+class MoveAnalysis:
+    """Search result of one root move"""
+
+    def __init__(self, move, score=None, depth=0, pv=None):
+        """
+        :param move: (row, column) of the move
+        :param score: score from the view of the side to move, None if not even depth 1 finished
+        :param depth: depth of the search that gave the score
+        :param pv: principal variation starting with the move, (row, column) or None for a pass
+        """
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.pv = pv if pv is not None else [move]
+
+    def as_dict(self):
+        return {'move': list(self.move), 'score': self.score, 'depth': self.depth,
+                'pv': [list(move) if move is not None else None for move in self.pv]}
+
+    def __repr__(self):
+        return 'MoveAnalysis(%s, score=%s, depth=%d, pv=%s)' % (self.move, self.score, self.depth, self.pv)
+
+
+def principal_variation(searcher, stones, symbol, key, length):
+    """
+    Follows the best moves stored in the transposition table
+    :return: list of (row, column) moves, None for a pass, at most length plies
+    """
+    stones = list(stones)
+    pv = []
+    while len(pv) < length:
+        moves = searcher.generate_moves(stones, symbol)
+        if not moves:
+            if not searcher.generate_moves(stones, 1 - symbol):
+                break
+            pv.append(None)
+            symbol = 1 - symbol
+            key ^= searcher.zobrist.turn
+            continue
+        entry = searcher.table.probe(key)
+        # a stale or colliding entry must not make the line illegal
+        if entry is None or entry.move not in moves:
+            break
+        move = entry.move
+        flipped = searcher.flips(move, stones[symbol], stones[1 - symbol])
+        stones[symbol] |= flipped | (1 << move)
+        stones[1 - symbol] ^= flipped
+        key = searcher.zobrist.move_key(key, move, flipped, symbol)
+        pv.append(searcher.geometry.coords(move))
+        symbol = 1 - symbol
+    return pv
+
+
+def analyze(board, side, budget=BUDGET, max_depth=player.MAX_DEPTH, searcher=None):
+    """
+    Scores every legal move of the position
+    :param board: nested list board of any supported size
+    :param side: color to move
+    :param budget: seconds for the whole analysis
+    :param max_depth: the analysis stops after this depth even with time left
+    :param searcher: player.MyPlayer of the side, its transposition table is reused - a new one if not given
+    :return: list of MoveAnalysis, the best first; empty if the side cannot move
+    """
+    if searcher is None or searcher.my_color != side:
+        searcher = player.MyPlayer(side, 1 - side, book=None)
+    if len(board) != searcher.size:
+        searcher.set_board_size(len(board))
+    stones = list(searcher.geometry.from_list(board, 0, searcher.space))
+    moves = searcher.generate_moves(stones, side)
+    if not moves:
+        return []
+    key = searcher.start_search(stones, time.time() + budget)
+    evaluate = searcher.evaluation()
+    empty_fields = searcher.squares - popcount(stones[0] | stones[1])
+    results = dict((move, MoveAnalysis(searcher.geometry.coords(move))) for move in moves)
+    searcher.ordering.order(moves, 0)
+    try:
+        for depth in range(1, max_depth + 1):
+            for move in moves:
+                scored = searcher.search_moves(stones, [move], depth, evaluate, key)
+                flipped = searcher.flips(move, stones[side], stones[1 - side])
+                child = list(stones)
+                child[side] |= flipped | (1 << move)
+                child[1 - side] ^= flipped
+                child_key = searcher.zobrist.move_key(key, move, flipped, side)
+                result = results[move]
+                result.score = scored.points
+                result.depth = depth
+                result.pv = [result.move] + principal_variation(searcher, child, 1 - side, child_key, depth - 1)
+            # the best moves first - they fill the table for the others in the next iteration
+            moves.sort(key=lambda move: results[move].score, reverse=True)
+            if depth >= empty_fields:
+                break
+    except player.SearchTimeout:
+        pass
+    finally:
+        searcher.deadline = float('inf')
+    return sorted(results.values(), key=lambda result: (result.score is not None, result.score), reverse=True)
+
+
+def analyze_position(job):
+    """
+    Analyzes one position of the batch in a worker process
+    :param job: (position dict with board and side, budget)
+    :return: the position dict with the analysis added
+    """
+    position, budget = job
+    position = dict(position)
+    position['analysis'] = [result.as_dict() for result in analyze(position['board'], position['side'], budget)]
+    return position
+
+
+def analyze_file(path, budget=BUDGET, processes=None):
+    """
+    Analyzes the JSON lines positions of the file on a process pool.
+    The file is read only as far ahead as the workers need, so it may be of any size.
+    :return: iterator of the analyzed position dicts, in the order of the file
+    """
+    processes = processes if processes is not None else os.cpu_count()
+    pending = collections.deque()
+    with open(path) as positions_file, ProcessPoolExecutor(processes) as pool:
+        for line in positions_file:
+            if not line.strip():
+                continue
+            pending.append(pool.submit(analyze_position, (json.loads(line), budget)))
+            if len(pending) >= QUEUED * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "t:j:o:")
+    options = dict(choices)
+    budget = float(options.get('-t', BUDGET))
+    if not args:
+        sample_board = [
+            [-1, -1, -1, -1, -1, -1, -1, 0],
+            [-1, -1, -1, 1, -1, -1, 0, -1],
+            [-1, -1, -1, -1, 1, 0, 1, 1],
+            [-1, -1, -1, 0, 0, 1, -1, -1],
+            [-1, -1, 0, 0, 0, 1, -1, -1],
+            [-1, -1, 0, 0, 0, -1, -1, -1],
+            [-1, -1, 0, -1, 0, -1, -1, -1],
+            [-1, -1, -1, -1, -1, -1, -1, -1],
+        ]
+        for result in analyze(sample_board, 1, budget):
+            print('%s  score %s  depth %d  pv %s' % (result.move, result.score, result.depth, result.pv))
+    else:
+        processes = int(options['-j']) if '-j' in options else None
+        output = open(options['-o'], 'w') if '-o' in options else sys.stdout
+        try:
+            for path in args:
+                for position in analyze_file(path, budget, processes):
+                    output.write(json.dumps(position) + '\n')
+        finally:
+            if output is not sys.stdout:
+                output.close()
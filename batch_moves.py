@@ -0,0 +1,98 @@
+"""
+Vectorized move generation for whole sets of positions.
+
+All positions of the batch are processed at once with NumPy, there is no
+Python loop over the positions or squares - only over the 8 directions and
+the ray lengths. Intended for offline analysis of large position sets.
+"""
+import numpy as np
+
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+
+def _look(padded, dr, dc, k, size):
+    """ Value of the field k steps in the direction [dr, dc] for every square """
+    r = size + k * dr
+    c = size + k * dc
+    return padded[:, r:r + size, c:c + size]
+
+
+def _pad(array, size):
+    return np.pad(array, ((0, 0), (size, size), (size, size)), constant_values=False)
+
+
+def flip_lengths(boards, sides, empty=-1):
+    """
+    Count the flipped stones in every direction for every square
+    :param boards: (N, size, size) array of positions
+    :param sides: (N,) array with the color to move in each position
+    :param empty: value of the empty field
+    :return: (8, N, size, size) array of flipped stone counts per direction
+    """
+    boards = np.asarray(boards)
+    sides = np.asarray(sides).reshape(-1, 1, 1)
+    size = boards.shape[1]
+    own = boards == sides
+    opp = ~own & (boards != empty)
+    own_padded = _pad(own, size)
+    opp_padded = _pad(opp, size)
+    lengths = np.zeros((len(DIRECTIONS),) + boards.shape, dtype=np.int8)
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        # active: squares whose ray so far contains only opponents stones
+        active = boards == empty
+        for k in range(1, size):
+            closed = active & _look(own_padded, dr, dc, k, size)
+            if k > 1:
+                lengths[d][closed] = k - 1
+            active &= _look(opp_padded, dr, dc, k, size)
+            if not active.any():
+                break
+    return lengths
+
+
+def batch_moves(boards, sides, empty=-1, with_boards=False):
+    """
+    Generate legal moves, flip counts and resulting positions for a batch of positions
+    :param boards: (N, size, size) array of positions
+    :param sides: (N,) array with the color to move in each position
+    :param empty: value of the empty field
+    :param with_boards: also build the boards after every legal move - N * size ** 4 values, only on request
+    :return: (legal, flip_counts, after) - legal is a (N, size, size) bool mask,
+        flip_counts a (N, size, size) int array and after a (N, size, size, size, size)
+        array where after[n, r, c] is the board n after playing [r, c]
+        (the unchanged board for illegal moves), None if with_boards is False
+    """
+    boards = np.asarray(boards)
+    sides = np.asarray(sides)
+    size = boards.shape[1]
+    lengths = flip_lengths(boards, sides, empty)
+    flip_counts = lengths.sum(axis=0, dtype=np.int16)
+    legal = flip_counts > 0
+    if not with_boards:
+        return legal, flip_counts, None
+
+    after = np.broadcast_to(boards[:, None, None, :, :], boards.shape[:1] + (size, size) + boards.shape[1:]).copy()
+    n, r, c = np.nonzero(legal)
+    after[n, r, c, r, c] = sides[n]
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        for k in range(1, size - 1):
+            n, r, c = np.nonzero(lengths[d] >= k)
+            if not len(n):
+                break
+            after[n, r, c, r + k * dr, c + k * dc] = sides[n]
+    return legal, flip_counts, after
+
+
+if __name__ == "__main__":
+    sample_board = [
+        [-1, -1, -1, -1, -1, -1, -1, 0],
+        [-1, -1, -1, 1, -1, -1, 0, -1],
+        [-1, -1, -1, -1, 1, 0, 1, 1],
+        [-1, -1, -1, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, -1, -1, -1],
+        [-1, -1, 0, -1, 0, -1, -1, -1],
+        [-1, -1, -1, -1, -1, -1, -1, -1],
+    ]
+    legal, counts, after = batch_moves(np.array([sample_board] * 2), np.array([0, 1]))
+    print(counts)
@@ -0,0 +1,194 @@
+"""
+Bitboard move generation for reversi.
+
+A position is stored as two integers, one bit per square. Square (r, c) of a
+board of size n is the bit number r * n + c, so row r of the nested list board
+maps to the bits r * n .. r * n + n - 1. Moves and flips are computed by
+shifting whole bitboards in the eight directions and masking out the stones
+that would wrap around the board edge.
+"""
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(bits):
+        """ Number of set bits """
+        return bin(bits).count('1')
+
+
+class Geometry(object):
+    """Precomputed shift tables for one board size"""
+
+    def __init__(self, size):
+        self.size = size
+        self.squares = size * size
+        self.full = (1 << self.squares) - 1
+        first_col = 0
+        last_col = 0
+        for r in range(size):
+            first_col |= 1 << (r * size)
+            last_col |= 1 << (r * size + size - 1)
+        not_first_col = self.full & ~first_col
+        not_last_col = self.full & ~last_col
+        # (shift, mask) pairs - the mask removes stones wrapped over the edge
+        self.left = []
+        self.right = []
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                if dr == 0 and dc == 0:
+                    continue
+                if dc == 1:
+                    mask = not_first_col
+                elif dc == -1:
+                    mask = not_last_col
+                else:
+                    mask = self.full
+                shift = dr * size + dc
+                if shift > 0:
+                    self.left.append((shift, mask))
+                else:
+                    self.right.append((-shift, mask))
+
+    def legal_moves(self, own, opp):
+        """
+        Find all legal moves for the player owning the own stones
+        :param own: bitboard of the player to move
+        :param opp: bitboard of the opponent
+        :return: bitboard with a bit set for every legal move
+        """
+        empty = ~(own | opp) & self.full
+        moves = 0
+        for shift, mask in self.left:
+            x = (own << shift) & mask & opp
+            while x:
+                x = (x << shift) & mask
+                moves |= x & empty
+                x &= opp
+        for shift, mask in self.right:
+            x = (own >> shift) & mask & opp
+            while x:
+                x = (x >> shift) & mask
+                moves |= x & empty
+                x &= opp
+        return moves
+
+    def flips(self, square, own, opp):
+        """
+        Find the stones flipped by playing on the square
+        :param square: bit number of the played square
+        :param own: bitboard of the player to move
+        :param opp: bitboard of the opponent
+        :return: bitboard of flipped stones, 0 if the move is not legal
+        """
+        bit = 1 << square
+        if (own | opp) & bit:
+            return 0
+        flipped = 0
+        for shift, mask in self.left:
+            x = (bit << shift) & mask
+            line = 0
+            while x & opp:
+                line |= x
+                x = (x << shift) & mask
+            if x & own:
+                flipped |= line
+        for shift, mask in self.right:
+            x = (bit >> shift) & mask
+            line = 0
+            while x & opp:
+                line |= x
+                x = (x >> shift) & mask
+            if x & own:
+                flipped |= line
+        return flipped
+
+    def neighbours(self, bits):
+        """ Bitboard of the squares next to the set bits in any of the eight directions """
+        result = 0
+        for shift, mask in self.left:
+            result |= (bits << shift) & mask
+        for shift, mask in self.right:
+            result |= (bits >> shift) & mask
+        return result
+
+    def edge_distances(self, square):
+        """ (rows to the nearest top or bottom edge, columns to the nearest side edge) of the field """
+        r, c = divmod(square, self.size)
+        return min(r, self.size - 1 - r), min(c, self.size - 1 - c)
+
+    def square(self, r, c):
+        """ Bit number of the field [r, c] """
+        return r * self.size + c
+
+    def coords(self, square):
+        """ Field [r, c] of the bit number """
+        return divmod(square, self.size)
+
+    def start_position(self):
+        """
+        Initial stones of both players
+        :return: (first player bitboard, second player bitboard)
+        """
+        half = self.size // 2
+        first = (1 << self.square(half - 1, half - 1)) | (1 << self.square(half, half))
+        second = (1 << self.square(half, half - 1)) | (1 << self.square(half - 1, half))
+        return first, second
+
+    def from_list(self, board, color, empty=-1):
+        """
+        Convert the nested list board into bitboards
+        :param board: board as a list of rows
+        :param color: color whose stones go to the first bitboard
+        :return: (color bitboard, other stones bitboard)
+        """
+        own = 0
+        opp = 0
+        bit = 1
+        for row in board:
+            for field in row:
+                if field == color:
+                    own |= bit
+                elif field != empty:
+                    opp |= bit
+                bit <<= 1
+        return own, opp
+
+    def to_list(self, own, opp, own_color, opp_color, empty=-1):
+        """ Convert the bitboards into a fresh nested list board """
+        board = []
+        bit = 1
+        for r in range(self.size):
+            row = [empty] * self.size
+            for c in range(self.size):
+                if own & bit:
+                    row[c] = own_color
+                elif opp & bit:
+                    row[c] = opp_color
+                bit <<= 1
+            board.append(row)
+        return board
+
+
+def iter_squares(bits):
+    """ Yields bit numbers of all set bits, lowest first """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+_geometries = {}
+
+
+def geometry(size):
+    """ Shared Geometry instance for the board size """
+    geo = _geometries.get(size)
+    if geo is None:
+        geo = _geometries[size] = Geometry(size)
+    return geo
+
+
+# The standard 8x8 board is used by the players directly
+GEOMETRY = geometry(8)
+legal_moves = GEOMETRY.legal_moves
+flips = GEOMETRY.flips
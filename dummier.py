@@ -1,16 +1,22 @@
-# board size 8x8
+# board size 8x8, 6x6 up to 12x12 are supported too
 # 2 rounds
 # 1 second per move
 # single thread only
-from copy import deepcopy
+import time
+from search_stats import SearchStats, profile, unprofiled_state, restore_state
+from bitboard import GEOMETRY, geometry, iter_squares, popcount
 
-# Tombstone constants
-MAX_SCORE = 64  # biggest score achievable
-MIN_SCORE = -MAX_SCORE
+# Seconds one move may take - the game allows 1 second, the rest is left for the game loop
+TIME_LIMIT = 0.8
+MAX_DEPTH = 140  # at most 140 empty fields (12x12), deeper search is never needed
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time for the move is over"""
 
 
 class Move:
-    """Stores the move coordinates with the points gained by playing it"""
+    """Stores the move field index (row * size + column) with the points gained by playing it"""
 
     def __init__(self, move, points):
         self.move = move
@@ -18,74 +24,141 @@ class Move:
 
 
 class MyPlayer:
-    """ Predict the game 4 moves ahead """
+    """ Predict the game as many moves ahead as the time limit allows """
 
-    def __init__(self, my_color, opponent_color):
+    def __init__(self, my_color, opponent_color, time_limit=TIME_LIMIT, profile_search=False):
         self.name = 'dummier'  # username student id
         self.my_color = my_color
         self.opponent_color = opponent_color
         self.space = -1
         # for debugging and further implementation
         self.valid_moves = []
+        self.time_limit = time_limit
+        self.deadline = float('inf')
+        self.depth_reached = 0
+        # statistics of the last move, profile_search adds timing of the search parts
+        self.stats = SearchStats()
+        if profile_search:
+            profile(self)
+        self.set_board_size(8)
+
+    def __getstate__(self):
+        # the timed methods of a profiled player are closures - they are made again on unpickling
+        return unprofiled_state(self)
+
+    def __setstate__(self, state):
+        restore_state(self, state)
+
+    def set_board_size(self, size):
+        """ Switches the move generation to the bitboards of the board size """
+        self.size = size
+        self.geometry = geometry(size)
+        # a won game scores the number of fields, no disc difference reaches it
+        self.max_score = self.geometry.squares
+        self.min_score = -self.max_score
+        self.legal_moves = self.geometry.legal_moves
+        self.flips = self.geometry.flips
 
     def move(self, board):
-        self.valid_moves = self.get_valid_moves(board, self.my_color)
+        self.stats.reset()
+        start_time = time.time()
+        move = self.find_move(board)
+        stats = self.stats
+        stats.times['total'] = time.time() - start_time
+        stats.depth = self.depth_reached
+        stats.log(self.name)
+        return move
+
+    def find_move(self, board):
+        """ Best move found within the time limit, None if there is no valid move """
+        # the search works on bitboards indexed by color - a search stopped by the timeout leaves them unfinished
+        if len(board) != self.size:
+            self.set_board_size(len(board))
+        stones = list(self.geometry.from_list(board, 0, self.space))
+        self.valid_moves = self.get_valid_moves(stones, self.my_color)
         if not self.valid_moves:
             return None
-        move = self.alpha_beta_search(self.my_color, board, MIN_SCORE, MAX_SCORE, 4, self.score)
-        return move.move
+        self.deadline = time.time() + self.time_limit
+        empty_fields = self.geometry.squares - popcount(stones[0] | stones[1])
+        best_move = self.valid_moves[0].move
+        self.depth_reached = 0
+        for depth in range(1, MAX_DEPTH + 1):
+            try:
+                move = self.alpha_beta_search(self.my_color, stones, self.min_score, self.max_score, depth,
+                                              self.score)
+            except SearchTimeout:
+                break
+            if move.move is not None:
+                best_move = move.move
+            self.depth_reached = depth
+            if depth >= empty_fields:
+                # the search reached the end of the game
+                break
+        self.deadline = float('inf')
+        return self.geometry.coords(best_move)
 
-    def alpha_beta_search(self, symbol, board, alpha, beta, depth, evaluate):
+    def alpha_beta_search(self, symbol, stones, alpha, beta, depth, evaluate, ply=0):
         """
         Find the best legal move for player, searching to the given depth. Standard alpha beta algorithm
         :rtype: Move
         :param symbol: player color
-        :param board: playing board
+        :param stones: playing board - bitboards indexed by color
         :param alpha: Maximum gain for me
         :param beta: Max opponent gain
         :param depth: How many moves ahead I see
         :param evaluate: Function that computes the board value
+        :param ply: How many moves from the root the board is
         :return: The considering given amount of moves
+        :raise SearchTimeout: when the deadline set by move() passes
         """
+        if time.time() > self.deadline:
+            raise SearchTimeout()
+        self.stats.nodes += 1
         # last examined board - return the board value for current symbol
         if depth == 0:
-            return Move(None, evaluate(board, symbol))
+            self.stats.leaves += 1
+            return Move(None, evaluate(stones, symbol))
 
-        def value(board, alpha, beta):
+        def value(stones, alpha, beta):
             # Compute the board value for the opponent of the current symbol
-            return -self.alpha_beta_search(self.find_opponent(symbol), board, -beta, -alpha, depth - 1, evaluate).points
+            return -self.alpha_beta_search(self.find_opponent(symbol), stones, -beta, -alpha, depth - 1, evaluate,
+                                           ply + 1).points
 
-        moves = self.get_valid_moves(board, symbol)
+        moves = self.generate_moves(stones, symbol)
         if not moves:
-            if not self.get_valid_moves(board, self.find_opponent(symbol)):
+            if not self.generate_moves(stones, self.find_opponent(symbol)):
                 # last round - return the last board score
-                return Move(None, self.final_value(symbol, board))
+                return Move(None, self.final_value(symbol, stones))
             # cannot play this round - return the board value unchanged
-            return Move(None, value(board, alpha, beta))
+            return Move(None, value(stones, alpha, beta))
 
-        best_move = moves[0]
-        best_move.points = alpha
+        best_move = Move(moves[0], alpha)
         for move in moves:
             if alpha >= beta:
                 # Skip those moves, that would bring disadvantage to the opponent
                 # The opponent will not play badly on purpose - no need to evaluate those nodes
                 # Expect the best possible move from the opponent
                 break
-            val = value(self.simulate_move(board, move.move, symbol), alpha, beta)
+            flipped = self.make_move(stones, move, symbol)
+            val = value(stones, alpha, beta)
+            self.unmake_move(stones, move, flipped)
             if val > alpha:
                 # Found new maximum - replace old maximum
                 alpha = val
-                best_move = move
+                best_move.move = move
                 best_move.points = alpha
+                if alpha >= beta:
+                    self.stats.cutoff(ply)
+
         return best_move
 
-    def final_value(self, symbol, board):
-        """If I win the last board return MAX_SCORE so the alpha beta uses this branch"""
-        score = self.score(board, symbol)
+    def final_value(self, symbol, stones):
+        """If I win the last board return the maximal score so the alpha beta uses this branch"""
+        score = self.score(stones, symbol)
         if score < 0:
-            return MIN_SCORE
+            return self.min_score
         elif score > 0:
-            return MAX_SCORE
+            return self.max_score
         return score
 
     @staticmethod
@@ -100,127 +173,66 @@ class MyPlayer:
         else:
             return -1
 
-    def score(self, board, symbol):
+    def score(self, stones, symbol):
         """ Counts number of stones minus opponents stones """
-        score = 0
-        for r in range(8):
-            for c in range(8):
-                if board[r][c] == symbol:
-                    score += 1
-                elif board[r][c] == self.find_opponent(symbol):
-                    score -= 1
-        return score
+        return popcount(stones[symbol]) - popcount(stones[1 - symbol])
 
-    def get_valid_moves(self, board, symbol):
+    def get_valid_moves(self, stones, symbol):
         """
-        Check all fields, and find out how many points I get if I play there
-        :param board: The board that the moves should be found on
+        Find all valid moves and how many stones each of them flips
+        :param stones: The board that the moves should be found on
         :param symbol: Examined symbol (player color)
-        :return: Collection ofall valid moves for given symbol on a current board
+        :return: Collection of all valid moves for given symbol, None if there is none
         """
-        valid_moves = []
-        for r in range(8):
-            for c in range(8):
-                # exam free spaces only
-                if board[r][c] == self.space:
-                    gain = self.check_move(board, r, c, symbol)
-                    if gain > 0:
-                        valid_moves.append(Move((r, c), gain))
+        own = stones[symbol]
+        opp = stones[1 - symbol]
+        flips = self.flips
+        valid_moves = [Move(square, popcount(flips(square, own, opp)))
+                       for square in iter_squares(self.legal_moves(own, opp))]
         if not valid_moves:
             return None
         else:
             return valid_moves
 
-    def check_move(self, board, r, c, symbol):
-        """
-        Inspects if the field is a valid move for a given symbol
-        Check all directions for other symbol and count the possible points
-        :param board:
-        :param r: row
-        :param c: column
-        :param symbol: examined symbol
-        :return: minimum of points, that the move provides, returns 0 if the move is not valid
-        """
-        points = 0
-        # h and v are directional vectors
-        for h in [-1, 0, 1]:
-            for v in [-1, 0, 1]:
-                if v != 0 or h != 0:
-                    if is_field_legit(r + h, c + v):
-                        examined = board[r + h][c + v]
-                        if examined != self.space and examined != symbol:
-                            points += self.count_points(board, r + h, c + v, h, v)
-                        # If I can flip some stones - the move is valid
-                        if points > 0:
-                            return points
-        return points
-
-    def count_points(self, board, r, c, horizontal_direction, vertical_direction):
-        """
-        Count how many stones are in a given direction
-        :param board:
-        :param r:
-        :param c:
-        :param horizontal_direction:
-        :param vertical_direction:
-        :return: 0 if the move is not valid - space found between stones
-        """
-        symbol = board[r][c]
-        count = 1
-        # k is a scalar multipliers for directional vectors
-        for k in range(1, 9):
-            if is_field_legit(r + k * horizontal_direction, c + k * vertical_direction):
-                if board[r + k * horizontal_direction][c + k * vertical_direction] == self.space:
-                    return 0
-                elif board[r + k * horizontal_direction][c + k * vertical_direction] == symbol:
-                    count += 1
-                else:
-                    return count
-            else:
-                return 0
-        return count
+    def generate_moves(self, stones, symbol):
+        """ Field indexes of all valid moves for the symbol """
+        return list(iter_squares(self.legal_moves(stones[symbol], stones[1 - symbol])))
 
     def simulate_move(self, board, move, symbol):
-        """ Performs a move on the board and returns a new (transformed) board """
+        """ Performs a move on the nested list board and returns a new (transformed) board """
         if move == None:
             return board
-        r = move[0]
-        c = move[1]
-        board_copy = deepcopy(board)
-        board_copy[r][c] = symbol
-
-        for v in [-1, 0, 1]:
-            for h in [-1, 0, 1]:
-                stones = []
-                if v == 0 == h:
-                    continue
-                row = r
-                col = c
-                row += v
-                col += h
-                while is_field_legit(row, col):
-                    # if it is other symbol
-                    if board_copy[row][col] != symbol and board_copy[row][col] != self.space:
-                        stones.append((row, col))
-                    # if space found - oon t flip this line
-                    elif board_copy[row][col] == self.space:
-                        break
-                    # same symbol found flip all stones
-                    elif board_copy[row][col] == symbol:
-                        for a, b in stones:
-                            board_copy[a][b] = symbol
-                        break
-                    row += v
-                    col += h
-        return board_copy
-
-
-def is_field_legit(r, c):
-    """
-    checks if the field is located within a board
-    :rtype: bool
-    """
-    return 0 <= r < 8 and 0 <= c < 8
+        if len(board) != self.size:
+            self.set_board_size(len(board))
+        stones = list(self.geometry.from_list(board, 0, self.space))
+        self.make_move(stones, self.geometry.square(move[0], move[1]), symbol)
+        return self.geometry.to_list(stones[0], stones[1], 0, 1, self.space)
+
+    def make_move(self, stones, move, symbol):
+        """
+        Performs a move in place
+        :param stones: bitboards indexed by color, changed by the move
+        :param move: field index of the placed stone, None for a pass
+        :param symbol: color of the placed stone
+        :return: bitboard of flipped stones - the undo record for unmake_move
+        """
+        if move is None:
+            return 0
+        own = stones[symbol]
+        opp = stones[1 - symbol]
+        flipped = self.flips(move, own, opp)
+        stones[symbol] = own | flipped | (1 << move)
+        stones[1 - symbol] = opp ^ flipped
+        return flipped
+
+    def unmake_move(self, stones, move, flipped):
+        """ Takes back the move played by make_move, flipped is its undo record """
+        if move is None:
+            return
+        bit = 1 << move
+        symbol = 0 if stones[0] & bit else 1
+        stones[symbol] ^= flipped | bit
+        stones[1 - symbol] |= flipped
 
 
 # Tests
@@ -247,7 +259,7 @@ if __name__ == "__main__":
         print(row)
 
     for item in player.valid_moves:
-        print(item.move, " - ", item.points)
+        print(GEOMETRY.coords(item.move), " - ", item.points)
 
     print("returned: ", pmove)
     playBoard = player.simulate_move(sample_board, pmove, player.my_color)
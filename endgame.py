@@ -0,0 +1,217 @@
+"""
+Exact endgame solver for the last empty fields of the board.
+
+The solver plays the game out to the end and returns the exact difference
+of stones. Empty fields are kept in a linked list, so a node only looks at
+the fields that are still free. Near the leaves the moves are tried by
+parity (fields in quadrants with an odd number of empties first), higher in
+the tree by fastest-first (moves leaving the opponent the fewest replies).
+"""
+import time
+
+import bitboard
+from bitboard import popcount
+
+# With more empty fields than this the moves are sorted by opponent mobility
+FASTEST_FIRST_EMPTIES = 6
+
+# Fields of the 8x8 board in the order they are tried - corners first, fields next to the corners last
+SQUARE_ORDER = [
+    0, 7, 56, 63,
+    2, 5, 16, 23, 40, 47, 58, 61,
+    18, 21, 42, 45,
+    3, 4, 24, 31, 32, 39, 59, 60,
+    19, 20, 26, 29, 34, 37, 43, 44,
+    11, 12, 25, 30, 33, 38, 51, 52,
+    10, 13, 17, 22, 41, 46, 50, 53,
+    1, 6, 8, 15, 48, 55, 57, 62,
+    9, 14, 49, 54,
+    27, 28, 35, 36,
+]
+
+
+def square_order(geometry):
+    """
+    Fields in the order they are tried. Other sizes than 8 rank every field like the 8x8 field
+    with the same distances to the edges - fields deeper inside than 3 rank like the center.
+    """
+    if geometry.size == 8:
+        return list(SQUARE_ORDER)
+    rank = {}
+    for index, square in enumerate(SQUARE_ORDER):
+        rank.setdefault(bitboard.GEOMETRY.edge_distances(square), index)
+
+    def field_rank(square):
+        dr, dc = geometry.edge_distances(square)
+        return rank[(min(dr, 3), min(dc, 3))], square
+
+    return sorted(range(geometry.squares), key=field_rank)
+
+
+def quadrants(geometry):
+    """ Bit of the quadrant each field lies in - xor of all empties gives the parity of each quadrant """
+    half = geometry.size // 2
+    return [1 << ((r >= half) * 2 + (c >= half)) for r in range(geometry.size) for c in range(geometry.size)]
+
+
+class SolverTimeout(Exception):
+    """Raised when the solver does not finish before its deadline"""
+
+
+class EndgameSolver:
+    """Perfect play search from (own, opp) bitboards, own is to move"""
+
+    def __init__(self, geometry=bitboard.GEOMETRY):
+        self.flips = geometry.flips
+        self.legal_moves = geometry.legal_moves
+        self.squares = geometry.squares
+        self.square_order = square_order(geometry)
+        self.quadrant = quadrants(geometry)
+        self.head = geometry.squares  # sentinel of the linked list of empty fields
+        self.nodes = 0
+        self.deadline = float('inf')
+        self.next = [self.head] * (self.head + 1)
+        self.prev = [self.head] * (self.head + 1)
+
+    def solve(self, own, opp, deadline=None, alpha=None, beta=None):
+        """
+        Find the exact result of the position
+        :param own: bitboard of the player to move
+        :param opp: bitboard of the opponent
+        :param deadline: time.time() value when SolverTimeout is raised, None for no limit
+        :param alpha: lower bound of the interesting scores, None for a lost game
+        :param beta: upper bound of the interesting scores, None for a won game
+        :return: (own stones - opponent stones at the end of the game, best field index or None)
+        :raise SolverTimeout: when the deadline passes
+        """
+        self.nodes = 0
+        self.deadline = float('inf') if deadline is None else deadline
+        if alpha is None:
+            alpha = -self.squares
+        if beta is None:
+            beta = self.squares
+        occupied = own | opp
+        head = self.head
+        last = head
+        parity = 0
+        empties = 0
+        for square in self.square_order:
+            if not occupied >> square & 1:
+                self.next[last] = square
+                self.prev[square] = last
+                last = square
+                parity ^= self.quadrant[square]
+                empties += 1
+        self.next[last] = head
+        self.prev[head] = last
+
+        moves = self.sorted_moves(own, opp, parity)
+        if not moves:
+            return -self.search(opp, own, -beta, -alpha, empties, parity, True), None
+        best_square = moves[0][0]
+        best = -self.squares - 1
+        for square, flipped in moves:
+            score = self.play(own, opp, square, flipped, alpha, beta, empties, parity)
+            if score > best:
+                best = score
+                best_square = square
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best, best_square
+
+    def play(self, own, opp, square, flipped, alpha, beta, empties, parity):
+        """ Score of the move for the player to move, the field is unlinked from the empties meanwhile """
+        after = self.next[square]
+        before = self.prev[square]
+        self.next[before] = after
+        self.prev[after] = before
+        score = -self.search(opp & ~flipped, own | flipped | (1 << square), -beta, -alpha, empties - 1,
+                             parity ^ self.quadrant[square], False)
+        self.next[before] = square
+        self.prev[after] = square
+        return score
+
+    def sorted_moves(self, own, opp, parity):
+        """
+        Fastest-first ordering - fewest opponent replies first, odd quadrants break ties
+        :return: list of (field, flipped stones)
+        """
+        flips = self.flips
+        legal_moves = self.legal_moves
+        quadrant = self.quadrant
+        head = self.head
+        nxt = self.next
+        ranked = []
+        square = nxt[head]
+        while square != head:
+            flipped = flips(square, own, opp)
+            if flipped:
+                replies = popcount(legal_moves(opp & ~flipped, own | flipped | (1 << square)))
+                even = 0 if parity & quadrant[square] else 1
+                ranked.append((replies * 2 + even, square, flipped))
+            square = nxt[square]
+        ranked.sort()
+        return [(square, flipped) for _, square, flipped in ranked]
+
+    def search(self, own, opp, alpha, beta, empties, parity, passed):
+        """
+        Negamax alpha beta to the end of the game
+        :param passed: the previous player had no move
+        :return: exact score for the player to move (fail-soft)
+        """
+        self.nodes += 1
+        if not self.nodes & 1023 and time.time() > self.deadline:
+            raise SolverTimeout()
+        if empties == 0:
+            return popcount(own) - popcount(opp)
+
+        best = -self.squares - 1
+        moved = False
+        if empties > FASTEST_FIRST_EMPTIES:
+            for square, flipped in self.sorted_moves(own, opp, parity):
+                moved = True
+                score = self.play(own, opp, square, flipped, alpha, beta, empties, parity)
+                if score > best:
+                    best = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            return best
+        else:
+            flips = self.flips
+            quadrant = self.quadrant
+            head = self.head
+            nxt = self.next
+            prv = self.prev
+            # fields of odd quadrants first, then the rest
+            for odd in (True, False):
+                square = nxt[head]
+                while square != head:
+                    if bool(parity & quadrant[square]) == odd:
+                        flipped = flips(square, own, opp)
+                        if flipped:
+                            moved = True
+                            after = nxt[square]
+                            before = prv[square]
+                            nxt[before] = after
+                            prv[after] = before
+                            score = -self.search(opp & ~flipped, own | flipped | (1 << square), -beta, -alpha,
+                                                 empties - 1, parity ^ quadrant[square], False)
+                            nxt[before] = square
+                            prv[after] = square
+                            if score > best:
+                                best = score
+                                if score > alpha:
+                                    alpha = score
+                                    if alpha >= beta:
+                                        return best
+                    square = nxt[square]
+
+        if not moved:
+            if passed:
+                # neither player can move - game over
+                return popcount(own) - popcount(opp)
+            return -self.search(opp, own, -beta, -alpha, empties, parity, True)
+        return best
@@ -0,0 +1,175 @@
+"""
+Positions mined from recorded games - e.g. endgame test sets for analysis.py or training data for fit_weights.py.
+
+The games of archives, JSON lines or transcript files (see game_record.py) are
+replayed on bitboards. Every position before a move that passes the filters
+is kept from the view of the color to move, with the final disc difference
+from the same view. Positions are deduplicated by symmetry.canonical_key, so
+rotated and mirrored copies count once. Every file is split into byte ranges
+at game boundaries (game_record.split_games) and the ranges are dealt among
+worker processes, so every game is read and decoded exactly once.
+
+>> python extract_positions.py -e 14 -o endgame14.jsonl games.rga
+>> python extract_positions.py -e 20-59 -j 4 -o positions.bin games.rga more_games.jsonl
+>> python extract_positions.py -k 0x1f3a5c... -o line.jsonl games.rga
+
+Options:
+    -o FILE      output, JSON lines {"board", "side", "empties", "score", "key"} for names ending with .jsonl,
+                 otherwise a positions file of selfplay.py (8x8 only), appended to (default positions.jsonl)
+    -e N         empty fields of the positions, N or MIN-MAX (default all)
+    -c COLOR     color to move (default both)
+    -k KEY       only games that reach the position with the key, the positions from there on
+    -j N         number of worker processes (default all cores)
+"""
+import getopt
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import geometry, popcount
+from game_record import read_games, split_games
+from selfplay import open_positions, RECORD
+from symmetry import canonical_key
+
+SPACE = -1
+
+
+class PositionFilter:
+    """Which positions of the games are kept"""
+
+    def __init__(self, min_empties=0, max_empties=12 * 12, color=None, reached_key=None):
+        """
+        :param color: color to move, None for both
+        :param reached_key: position key the game has to reach, positions before it are skipped - None for all games
+        """
+        self.min_empties = min_empties
+        self.max_empties = max_empties
+        self.color = color
+        self.reached_key = reached_key
+
+    def accepts(self, empties, color):
+        return self.min_empties <= empties <= self.max_empties and (self.color is None or self.color == color)
+
+
+def game_positions(record, position_filter):
+    """
+    Replays one game
+    :param record: game_record.GameRecord
+    :return: list of (key, board size, color to move, own stones, opponent stones, final disc difference)
+        of the positions that pass the filter
+    """
+    if record.wrong_move_color is not None:
+        return []
+    size = record.board_size
+    board_geometry = geometry(size)
+    final = dict(zip(record.colors, record.score))
+    stones = {}
+    stones[record.colors[0]], stones[record.colors[1]] = board_geometry.start_position()
+    empties = board_geometry.squares - 4
+    reached = position_filter.reached_key is None
+    positions = []
+    for color, square in record.plays():
+        own = stones[color]
+        opp = stones[1 - color]
+        if not reached:
+            reached = canonical_key(own, opp, size) == position_filter.reached_key
+        if reached and position_filter.accepts(empties, color):
+            positions.append((canonical_key(own, opp, size), size, color, own, opp, final[color] - final[1 - color]))
+        flipped = board_geometry.flips(square, own, opp)
+        stones[color] = own | flipped | (1 << square)
+        stones[1 - color] = opp ^ flipped
+        empties -= 1
+    return positions
+
+
+def extract_range(job):
+    """
+    Collects the positions of the games in a byte range of a file, run in a worker process
+    :param job: (game file path, start, end, PositionFilter)
+    :return: dict key -> (game index in the range, position tuple of game_positions) of the first occurrence
+        of every position
+    """
+    path, start, end, position_filter = job
+    positions = {}
+    for index, record in enumerate(read_games(path, start=start, end=end)):
+        for position in game_positions(record, position_filter):
+            if position[0] not in positions:
+                positions[position[0]] = (index, position)
+    return positions
+
+
+def extract(paths, position_filter, processes=None):
+    """
+    Positions of all the games that pass the filter, every position once
+    :param processes: number of worker processes, None for all cores, 1 runs in this process
+    :return: list of (key, board size, color to move, own stones, opponent stones, final disc difference)
+    """
+    processes = processes if processes is not None else os.cpu_count()
+    jobs = [(path, start, end, position_filter) for path in paths for start, end in split_games(path, processes)]
+    positions = {}
+    if processes == 1:
+        results = map(extract_range, jobs)
+    else:
+        pool = ProcessPoolExecutor(processes)
+        results = pool.map(extract_range, jobs)
+    try:
+        for job_index, result in enumerate(results):
+            for key, (index, position) in result.items():
+                # the earliest game keeps the position, whatever the number of workers
+                first = (job_index, index, position)
+                if key not in positions or first < positions[key]:
+                    positions[key] = first
+    finally:
+        if processes != 1:
+            pool.shutdown()
+    return [position for job_index, index, position in sorted(positions.values())]
+
+
+def write_json(path, positions):
+    """ Appends the positions as JSON lines, the input of analysis.py """
+    with open(path, 'a') as output:
+        for key, size, color, own, opp, score in positions:
+            board = geometry(size).to_list(own, opp, color, 1 - color, SPACE)
+            output.write(json.dumps({'board': board, 'side': color, 'empties': size * size - popcount(own | opp),
+                                     'score': score, 'key': '%#x' % key}) + '\n')
+    return len(positions)
+
+
+def write_positions(path, positions):
+    """
+    Appends the 8x8 positions to a positions file, the input of fit_weights.py
+    :return: number of positions written - other board sizes are left out
+    """
+    written = 0
+    with open_positions(path) as output:
+        for key, size, color, own, opp, score in positions:
+            if size == 8:
+                output.write(RECORD.pack(own, opp, score))
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "o:e:c:k:j:")
+    options = dict(choices)
+    if not args:
+        print('No game files given.')
+        sys.exit(1)
+    position_filter = PositionFilter()
+    if '-e' in options:
+        empties = options['-e'].split('-')
+        position_filter.min_empties = int(empties[0])
+        position_filter.max_empties = int(empties[-1])
+    if '-c' in options:
+        position_filter.color = int(options['-c'])
+    if '-k' in options:
+        position_filter.reached_key = int(options['-k'], 0)
+    processes = int(options['-j']) if '-j' in options else None
+    positions = extract(args, position_filter, processes)
+    output = options.get('-o', 'positions.jsonl')
+    if output.endswith('.jsonl'):
+        written = write_json(output, positions)
+    else:
+        written = write_positions(output, positions)
+    print('%d positions written to %s' % (written, output))
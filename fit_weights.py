@@ -0,0 +1,142 @@
+"""
+Least squares fit of the pattern weights to self-play positions.
+
+The evaluation is linear in the weights: every position adds up one weight
+per pattern instance from the tables of its game phase. The weights that
+predict the final disc difference best are the solution of the normal
+equations (A^T A + ridge I) w = A^T b, solved by conjugate gradients.
+Every iteration is one pass over the memory mapped positions in chunks,
+so the memory use depends on the chunk size and the number of weights,
+not on the number of positions.
+
+>> python fit_weights.py positions.bin
+>> python fit_weights.py -i 50 -c 500000 -o pattern_weights.bin positions.bin more_positions.bin
+
+Options:
+    -i N         conjugate gradient iterations (default 30)
+    -c N         positions in one chunk (default 1000000)
+    -l X         ridge regularization, pulls rarely seen weights to zero (default 1.0)
+    -o FILE      output weights file (default the file the player loads)
+"""
+import getopt
+import sys
+
+import numpy as np
+
+from pattern_eval import PATTERNS, TABLE_SIZES, PHASES, WEIGHTS_FILE, save_weights
+from selfplay import load_positions
+
+# evaluation units per disc of the final difference
+SCORE_SCALE = 8
+CHUNK_SIZE = 1000000
+
+TABLES_SIZE = sum(TABLE_SIZES)
+TABLE_OFFSETS = [sum(TABLE_SIZES[:i]) for i in range(len(TABLE_SIZES))]
+BYTE_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int64)
+
+
+def features(own, opp, phases=PHASES):
+    """
+    Weight indexes used by the evaluation of every position
+    :param own: uint64 array of the stones of the color to move
+    :param opp: uint64 array of the opponent stones
+    :return: (N, pattern instances) array of indexes into the flat weights of all phases
+    """
+    discs = BYTE_COUNTS[(own | opp).view(np.uint8).reshape(-1, 8)].sum(axis=1)
+    empties = np.minimum(64 - discs, 60)
+    phase_offset = (60 - empties) * phases // 61 * TABLES_SIZE
+    columns = []
+    for (name, instances), table_offset in zip(PATTERNS, TABLE_OFFSETS):
+        for squares in instances:
+            index = np.zeros(len(own), dtype=np.int64)
+            for power, square in enumerate(squares):
+                shift = np.uint64(square)
+                state = ((own >> shift) & np.uint64(1)) + 2 * ((opp >> shift) & np.uint64(1))
+                index += 3 ** power * state.astype(np.int64)
+            columns.append(phase_offset + table_offset + index)
+    return np.stack(columns, axis=1)
+
+
+def chunks(position_sets, chunk_size):
+    """ (features, targets) of the positions, chunk by chunk """
+    for positions in position_sets:
+        for start in range(0, len(positions), chunk_size):
+            chunk = np.asarray(positions[start:start + chunk_size])
+            yield features(chunk['own'], chunk['opp']), chunk['score'].astype(np.float64) * SCORE_SCALE
+
+
+def predict(columns, weights):
+    return weights[columns].sum(axis=1)
+
+
+def transpose_product(columns, values, size):
+    """ A^T values - every position adds its value to all weights it uses """
+    result = np.zeros(size)
+    for column in columns.T:
+        result += np.bincount(column, weights=values, minlength=size)
+    return result
+
+
+def fit(position_sets, iterations=30, chunk_size=CHUNK_SIZE, ridge=1.0, phases=PHASES, progress=None):
+    """
+    Fits the weights of all phases
+    :param position_sets: record arrays returned by selfplay.load_positions
+    :param progress: called with (iteration, root mean square error in discs) after every pass
+    :return: for every phase a list of weight tables in PATTERNS order
+    """
+    size = phases * TABLES_SIZE
+    weights = np.zeros(size)
+    # the start is zero weights, the residual of the normal equations is A^T b
+    gradient = np.zeros(size)
+    for columns, targets in chunks(position_sets, chunk_size):
+        gradient += transpose_product(columns, targets, size)
+    direction = gradient.copy()
+    gamma = gradient.dot(gradient)
+    for iteration in range(1, iterations + 1):
+        if gamma == 0:
+            break
+        # one pass computes the product with the normal matrix and the error of the current weights
+        product = ridge * direction
+        squared_error = 0.0
+        count = 0
+        for columns, targets in chunks(position_sets, chunk_size):
+            product += transpose_product(columns, predict(columns, direction), size)
+            errors = targets - predict(columns, weights)
+            squared_error += errors.dot(errors)
+            count += len(targets)
+        if progress is not None and count:
+            progress(iteration, (squared_error / count) ** 0.5 / SCORE_SCALE)
+        curvature = direction.dot(product)
+        if curvature <= 0:
+            break
+        step = gamma / curvature
+        weights += step * direction
+        gradient -= step * product
+        gamma_next = gradient.dot(gradient)
+        direction = gradient + gamma_next / gamma * direction
+        gamma = gamma_next
+    tables = []
+    for phase in range(phases):
+        phase_weights = weights[phase * TABLES_SIZE:(phase + 1) * TABLES_SIZE]
+        tables.append([phase_weights[offset:offset + table_size]
+                       for offset, table_size in zip(TABLE_OFFSETS, TABLE_SIZES)])
+    return tables
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "i:c:l:o:")
+    options = dict(choices)
+    if not args:
+        print('No positions file given.')
+        sys.exit(1)
+    position_sets = [load_positions(path) for path in args]
+    print('%d positions' % sum(len(positions) for positions in position_sets))
+
+    def report(iteration, error):
+        print('iteration %d: error %.3f discs' % (iteration, error))
+
+    tables = fit(position_sets, int(options.get('-i', 30)), int(options.get('-c', CHUNK_SIZE)),
+                 float(options.get('-l', 1.0)), progress=report)
+    output = options.get('-o', WEIGHTS_FILE)
+    save_weights(output, tables)
+    print('Weights written to %s' % output)
@@ -1,4 +1,29 @@
-import copy
+import bitboard
+
+# board sizes the game and the players support - even, so the start position has a center
+BOARD_SIZES = (6, 8, 10, 12)
+
+class BoardRow(list):
+	'''
+	Row of the board list view - a field written to the row is played onto the bitboards too.
+	'''
+
+	def __init__(self, game_board, rows, r, fields):
+		list.__init__(self, fields)
+		self.game_board = game_board
+		self.rows = rows
+		self.r = r
+
+	def __setitem__(self, c, color):
+		# negative and out of range columns as for any list
+		c = range(len(self))[c]
+		game_board = self.game_board
+		current = game_board.snapshot is self.rows
+		game_board.set_field(self.r, c, color)
+		list.__setitem__(self, c, color)
+		if current:
+			# the other rows still show the board, the view is kept
+			game_board.snapshot = self.rows
 
 class GameBoard(object):
 
@@ -7,123 +32,172 @@ class GameBoard(object):
 		self.p1_color = player1_color
 		self.p2_color = player2_color
 		self.empty_color = empty_color
-		self.board = self.init_board()
+		self.geometry = bitboard.geometry(board_size)
+		self.init_board()
 
 	def clear(self):
-		self.board = self.init_board()	
+		self.init_board()
 
 	def init_board(self):
 		'''
 		Crates board and adds initial stones.
 		:return: Initiated board
 		'''
-		board = [self.empty_color]*self.board_size
-		for row in range(self.board_size):
-			board[row] = [self.empty_color]*self.board_size
+		self.p1_stones, self.p2_stones = self.geometry.start_position()
+		self.refresh()
+		return self.board
 
-		board[self.board_size //2-1][self.board_size //2-1] = self.p1_color
-		board[self.board_size //2][self.board_size //2] = self.p1_color
-		board[self.board_size //2][self.board_size //2-1] = self.p2_color
-		board[self.board_size //2-1][self.board_size //2] = self.p2_color
+	def refresh(self):
+		'''
+		Recomputes the tracked empty fields and frontier from the stones.
+		Legal moves are computed on the first question after every change.
+		'''
+		occupied = self.p1_stones | self.p2_stones
+		self.empties = self.geometry.full & ~occupied
+		self.frontier = self.geometry.neighbours(occupied) & self.empties
+		self.legal = {}
+		self.tracked = (self.p1_stones, self.p2_stones)
+		self.snapshot = None
+
+	def check_tracked(self):
+		'''
+		The stones may be assigned directly (e.g. to undo a move) - then the tracked sets are rebuilt.
+		'''
+		if self.tracked != (self.p1_stones, self.p2_stones):
+			self.refresh()
+
+	@property
+	def board(self):
+		'''
+		Board as a list of rows, built from the bitboards.
+		The list is kept until the stones change, so indexing it field by field is cheap.
+		A field written to a row (board[r][c] = color) is set on the bitboards as well,
+		a whole board is written through the setter. get_board_copy gives plain lists to modify freely.
+		'''
+		self.check_tracked()
+		if self.snapshot is None:
+			rows = []
+			fields = self.geometry.to_list(self.p1_stones, self.p2_stones, self.p1_color, self.p2_color, self.empty_color)
+			for r, row in enumerate(fields):
+				rows.append(BoardRow(self, rows, r, row))
+			self.snapshot = rows
+		return self.snapshot
+
+	@board.setter
+	def board(self, board):
+		self.p1_stones, self.p2_stones = self.geometry.from_list(board, self.p1_color, self.empty_color)
+		self.refresh()
+
+	def set_field(self, r, c, color):
+		'''
+		Puts a stone of the color on the field, or empties it with empty_color - no stones are flipped.
+		'''
+		bit = 1 << self.geometry.square(r, c)
+		self.p1_stones &= ~bit
+		self.p2_stones &= ~bit
+		if color == self.p1_color:
+			self.p1_stones |= bit
+		elif color == self.p2_color:
+			self.p2_stones |= bit
+		self.refresh()
+
+	def get_stones(self, players_color):
+		'''
+		:return: (players bitboard, opponents bitboard)
+		'''
+		if players_color == self.p1_color:
+			return self.p1_stones, self.p2_stones
+		return self.p2_stones, self.p1_stones
 
-		return board
+	def set_stones(self, players_color, own, opp):
+		if players_color == self.p1_color:
+			self.p1_stones, self.p2_stones = own, opp
+		else:
+			self.p2_stones, self.p1_stones = own, opp
 
 	def play_move(self,move,player,players_color):
 		'''
 		:param move: position where the move is made [x,y]
 		:param player: player that made the move
 		'''
-
-		self.board[move[0]][move[1]] = players_color
-		dx = [-1,-1,-1,0,1,1,1,0]
-		dy = [-1,0,1,1,1,0,-1,-1]
-		for i in range(len(dx)):
-			if self.confirm_direction(move,dx[i],dy[i],player,players_color):
-				self.change_stones_in_direction(move,dx[i],dy[i],player,players_color)
-
+		self.check_tracked()
+		own, opp = self.get_stones(players_color)
+		square = self.geometry.square(move[0], move[1])
+		bit = 1 << square
+		flipped = self.geometry.flips(square, own, opp)
+		self.set_stones(players_color, own | flipped | bit, opp & ~flipped)
+		# only the played field stops being empty, the frontier grows by its neighbours
+		self.empties &= ~bit
+		self.frontier = (self.frontier | self.geometry.neighbours(bit)) & self.empties
+		self.legal = {}
+		self.tracked = (self.p1_stones, self.p2_stones)
+		self.snapshot = None
 
 	def is_correct_move(self,move,player,players_color):
 		'''
 		Check if the move is correct
 		'''
-		if self.board[move[0]][move[1]] == self.empty_color:
-			dx = [-1,-1,-1,0,1,1,1,0]
-			dy = [-1,0,1,1,1,0,-1,-1]
-			for i in range(len(dx)):
-				if self.confirm_direction(move,dx[i],dy[i],player,players_color):
-					return True
+		if not (0 <= move[0] < self.board_size and 0 <= move[1] < self.board_size):
+			return False
+		self.check_tracked()
+		square = self.geometry.square(move[0], move[1])
+		# a field away from the frontier can not be a move, the legal moves are not needed
+		if not (self.frontier >> square) & 1:
+			return False
+		return (self.get_legal_moves(players_color) >> square) & 1 == 1
 
-		return False
-
-	def confirm_direction(self,move,dx,dy,player,players_color):        
+	def can_play(self, player, players_color):
 		'''
-		Looks into dirextion [dx,dy] to find if the move in this dirrection is correct.
-		It means that first stone in the direction is oponents and last stone is players.
-		:param move: position where the move is made [x,y]
-		:param dx: x direction of the search
-		:param dy: y direction of the search
-		:param player: player that made the move
-		:return: True if move in this direction is correct
+		:return: True if there is a possible move for player
 		'''
-		if players_color == self.p1_color:
-			opponents_color = self.p2_color
-		else:
-			opponents_color = self.p1_color
-
-		posx = move[0]+dx
-		posy = move[1]+dy
-		if (posx>=0) and (posx<self.board_size) and (posy>=0) and (posy<self.board_size):
-			if self.board[posx][posy] == opponents_color:
-				while (posx>=0) and (posx<self.board_size) and (posy>=0) and (posy<self.board_size):
-					posx += dx
-					posy += dy
-					if (posx>=0) and (posx<self.board_size) and (posy>=0) and (posy<self.board_size):
-						if self.board[posx][posy] == self.empty_color:
-							return False
-						if self.board[posx][posy] == players_color:
-							return True
-
-		return False
-
-	def change_stones_in_direction(self,move,dx,dy,player,players_color):
-		posx = move[0]+dx
-		posy = move[1]+dy
-		while (not(self.board[posx][posy] == players_color)):
-			self.board[posx][posy] = players_color
-			posx += dx
-			posy += dy
+		return self.get_legal_moves(players_color) != 0
 
-	def can_play(self, player, players_color):
+	def get_legal_moves(self, players_color):
 		'''
-		:return: True if there is a possible move for player
+		:return: bitboard of the legal moves, computed once for every position and color
+		'''
+		self.check_tracked()
+		moves = self.legal.get(players_color)
+		if moves is None:
+			if self.frontier:
+				own, opp = self.get_stones(players_color)
+				moves = self.geometry.legal_moves(own, opp)
+			else:
+				# a full board or no stone next to an empty field - nobody can move
+				moves = 0
+			self.legal[players_color] = moves
+		return moves
+
+	def get_empty_fields(self):
 		'''
-		for x in range(self.board_size):
-			for y in range(self.board_size):
-				if self.is_correct_move([x,y],player, players_color):
-					return True
+		:return: bitboard of the empty fields
+		'''
+		self.check_tracked()
+		return self.empties
 
-		return False
+	def get_frontier(self):
+		'''
+		:return: bitboard of the empty fields next to a stone - every legal move is one of them
+		'''
+		self.check_tracked()
+		return self.frontier
 
 	def get_board_copy(self):
-		return copy.deepcopy(self.board)
+		'''
+		:return: new board as a list of rows, free to be modified by the caller
+		'''
+		return self.geometry.to_list(self.p1_stones, self.p2_stones, self.p1_color, self.p2_color, self.empty_color)
 
 	def get_score(self):
-		stones = [0 , 0]
-		for x in range(self.board_size):
-			for y in range(self.board_size):
-				if self.board[x][y] == self.p1_color:
-					stones[0] += 1
-				if self.board[x][y] == self.p2_color:
-					stones[1] += 1
-		return stones
+		return [bitboard.popcount(self.p1_stones), bitboard.popcount(self.p2_stones)]
 
 	def print_board(self):
-		for x in range(self.board_size):
+		for row in self.board:
 			row_string = ''
-			for y in range(self.board_size):
-				if self.board[x][y] == -1:
+			for field in row:
+				if field == self.empty_color:
 					row_string += ' -'
 				else:
-					row_string += ' ' + str(self.board[x][y])
+					row_string += ' ' + str(field)
 			print(row_string)
-		print('')
\ No newline at end of file
+		print('')
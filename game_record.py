@@ -0,0 +1,430 @@
+"""
+Game records - every move packed into one byte, with the players, move times and result.
+
+A move is its field index r * size + c (at most 143 on the 12x12 board), a
+pass is the byte 255. The color of a move follows from the first color and
+the passes, so the moves replay without the board. Archives are append-only
+binary files of games, read back as a stream over a memory map:
+
+    header   4 byte magic, 1 byte version
+    games    board size (uint8), first color (uint8), color of the forfeit (int8, -1 none),
+             flags (uint8, 1 = move times stored), final stones of the first and the second player (uint8 each),
+             name lengths of the first and the second player (uint8 each), move bytes (uint16),
+             then the UTF-8 names, the move bytes and the move times in ms (uint16 each,
+             one per played move), little endian
+
+Game record files ending with .rga are archives, other files hold one JSON
+record per line (HeadlessReversiCreator.get_record). Text transcripts list the
+played fields as column letter and row number, rows counted from the bottom
+like in chess, so the transcripts of the usual notation (f5d6c3...) replay
+from the start position of GameBoard. Passes are left out of transcripts.
+
+>> python game_record.py games.rga                       prints the transcripts of the games
+>> python game_record.py -o games.rga games.jsonl        appends the JSON lines games to the archive
+>> python game_record.py -s 10 -o games.rga transcripts.txt
+
+Options:
+    -o FILE      archive the games of the input files are appended to
+    -s N         board size of transcript files (default 8)
+"""
+import array
+import getopt
+import json
+import mmap
+import os
+import struct
+import sys
+
+from bitboard import geometry, popcount
+
+MAGIC = b'RVGA'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+GAME = struct.Struct('<BBbBBBBBH')
+
+ARCHIVE_SUFFIX = '.rga'
+
+PASS = 255
+TIMES = 1  # flag of the stored move times
+MAX_TIME_MS = 0xFFFF
+
+COLUMNS = 'abcdefghijkl'
+
+
+class GameRecord:
+    """One game with the moves packed one byte each"""
+
+    __slots__ = ('players', 'colors', 'board_size', 'move_bytes', 'times_ms', 'score', 'wrong_move_color')
+
+    def __init__(self, players, colors, board_size, move_bytes, times_ms=(), score=(0, 0), wrong_move_color=None):
+        """
+        :param players: names of the first and the second player
+        :param colors: colors of the first and the second player, the first player starts
+        :param move_bytes: field index of every move, PASS for a pass
+        :param times_ms: milliseconds of every played move, empty if unknown
+        :param score: final stones of the first and the second player
+        :param wrong_move_color: color of the player who lost by a wrong or too slow move, None if the game finished
+        """
+        self.players = list(players)
+        self.colors = list(colors)
+        self.board_size = board_size
+        self.move_bytes = bytes(move_bytes)
+        self.times_ms = list(times_ms)
+        self.score = list(score)
+        self.wrong_move_color = wrong_move_color
+
+    @classmethod
+    def from_dict(cls, record):
+        """ Packs a JSON game record - a last move outside of the board (a forfeit) is dropped """
+        size = record.get('board_size', 8)
+        color = record['colors'][0]
+        move_bytes = bytearray()
+        for move_color, r, c in record['moves']:
+            if not (0 <= r < size and 0 <= c < size):
+                break
+            if move_color != color:
+                move_bytes.append(PASS)
+            move_bytes.append(r * size + c)
+            color = 1 - move_color
+        times_ms = record.get('times_ms', ())[:len(move_bytes) - move_bytes.count(PASS)]
+        return cls(record['players'], record['colors'], size, move_bytes, times_ms, record['score'],
+                   record.get('wrong_move_color'))
+
+    def as_dict(self):
+        """ The JSON game record """
+        return {
+            'players': self.players,
+            'colors': self.colors,
+            'board_size': self.board_size,
+            'moves': self.moves(),
+            'times_ms': self.times_ms,
+            'score': self.score,
+            'wrong_move_color': self.wrong_move_color,
+        }
+
+    def plays(self):
+        """ Yields (color, field index) of the played moves, the passes skipped """
+        color = self.colors[0]
+        for move in self.move_bytes:
+            if move != PASS:
+                yield color, move
+            color = 1 - color
+
+    def moves(self):
+        """ [color, row, column] of the played moves, as in the JSON record """
+        size = self.board_size
+        return [[color, square // size, square % size] for color, square in self.plays()]
+
+    def transcript(self):
+        """ Played fields as text, e.g. f5d6c3 """
+        size = self.board_size
+        return ''.join(square_name(square, size) for color, square in self.plays())
+
+    @classmethod
+    def from_transcript(cls, text, board_size=8, players=('', ''), colors=(0, 1)):
+        """
+        Replays a text transcript from the start position, the passes are found by the replay
+        :raise ValueError: on an unknown field or an illegal move
+        """
+        board_geometry = geometry(board_size)
+        stones = {}
+        stones[colors[0]], stones[colors[1]] = board_geometry.start_position()
+        color = colors[0]
+        move_bytes = bytearray()
+        for square in parse_transcript(text, board_size):
+            own = stones[color]
+            opp = stones[1 - color]
+            if not board_geometry.legal_moves(own, opp):
+                # the side to move passes
+                move_bytes.append(PASS)
+                color = 1 - color
+                own, opp = opp, own
+            if not board_geometry.legal_moves(own, opp) >> square & 1:
+                raise ValueError('Illegal move %s in the transcript %s' % (square_name(square, board_size), text))
+            flipped = board_geometry.flips(square, own, opp)
+            stones[color] = own | flipped | (1 << square)
+            stones[1 - color] = opp ^ flipped
+            move_bytes.append(square)
+            color = 1 - color
+        score = [popcount(stones[colors[0]]), popcount(stones[colors[1]])]
+        return cls(players, colors, board_size, move_bytes, (), score)
+
+    def pack(self):
+        """ The game as archive bytes """
+        names = [name.encode('utf-8')[:255] for name in self.players]
+        times = b''
+        flags = 0
+        # the reader finds the times by the number of played moves - times that do not match are left out
+        if self.times_ms and len(self.times_ms) == len(self.move_bytes) - self.move_bytes.count(PASS):
+            flags |= TIMES
+            times = array.array('H', [min(int(round(time_ms)), MAX_TIME_MS) for time_ms in self.times_ms])
+            if sys.byteorder != 'little':
+                times.byteswap()
+            times = times.tobytes()
+        wrong_move_color = -1 if self.wrong_move_color is None else self.wrong_move_color
+        return b''.join((GAME.pack(self.board_size, self.colors[0], wrong_move_color, flags, self.score[0],
+                                   self.score[1], len(names[0]), len(names[1]), len(self.move_bytes)),
+                         names[0], names[1], self.move_bytes, times))
+
+    @classmethod
+    def unpack_from(cls, data, offset=0):
+        """
+        Reads one game of archive bytes
+        :return: (GameRecord, offset after the game)
+        :raise ValueError: when the game is cut off
+        """
+        if offset + GAME.size > len(data):
+            raise ValueError('Game record cut off')
+        size, first, wrong_move_color, flags, score1, score2, name1, name2, length = GAME.unpack_from(data, offset)
+        offset += GAME.size
+        if offset + name1 + name2 + length > len(data):
+            raise ValueError('Game record cut off')
+        players = [data[offset:offset + name1].decode('utf-8', 'replace'),
+                   data[offset + name1:offset + name1 + name2].decode('utf-8', 'replace')]
+        offset += name1 + name2
+        move_bytes = data[offset:offset + length]
+        offset += length
+        # one time per played move - the passes take no time
+        end = offset + 2 * (length - move_bytes.count(PASS)) if flags & TIMES else offset
+        if end > len(data):
+            raise ValueError('Game record cut off')
+        times = array.array('H')
+        times.frombytes(data[offset:end])
+        if sys.byteorder != 'little':
+            times.byteswap()
+        record = cls(players, (first, 1 - first), size, move_bytes, times, (score1, score2),
+                     None if wrong_move_color < 0 else wrong_move_color)
+        return record, end
+
+
+def square_name(square, size=8):
+    """ Transcript name of the field index, rows counted from the bottom """
+    r, c = divmod(square, size)
+    return '%s%d' % (COLUMNS[c], size - r)
+
+
+def parse_transcript(text, size=8):
+    """
+    Field indexes of the moves of a transcript, letters in any case, spaces and dashes ignored
+    :raise ValueError: on a field outside of the board
+    """
+    text = text.strip().lower()
+    squares = []
+    position = 0
+    while position < len(text):
+        letter = text[position]
+        if letter in ' -,':
+            position += 1
+            continue
+        digits = position + 1
+        while digits < len(text) and text[digits].isdigit():
+            digits += 1
+        c = COLUMNS.find(letter)
+        if c < 0 or c >= size or digits == position + 1 or not 1 <= int(text[position + 1:digits]) <= size:
+            raise ValueError('Unknown field %s in the transcript %s' % (text[position:digits], text))
+        squares.append((size - int(text[position + 1:digits])) * size + c)
+        position = digits
+    return squares
+
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIX)
+
+
+def create_archive(path):
+    """ Writes the header of a new archive, an existing archive is left as it is """
+    try:
+        with open(path, 'xb') as archive_file:
+            archive_file.write(HEADER.pack(MAGIC, VERSION))
+    except FileExistsError:
+        pass
+
+
+def prepare_record_file(path):
+    """
+    Makes the record file ready for games appended by several worker processes.
+    An archive gets its header here once, so the workers only append their games.
+    :param path: record file path, None records nothing
+    """
+    if path is not None and is_archive(path):
+        create_archive(path)
+
+
+class ArchiveWriter:
+    """Appends games to an archive, one write per game so processes can share the file"""
+
+    def __init__(self, path):
+        create_archive(path)
+        self.path = path
+        self.file = open(path, 'ab')
+
+    def write(self, record):
+        """ :param record: GameRecord or JSON game record """
+        if isinstance(record, dict):
+            record = GameRecord.from_dict(record)
+        self.file.write(record.pack())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def append_game(path, record):
+    """ Appends one JSON game record to the archive or to the JSON lines file, by the file name """
+    if is_archive(path):
+        with ArchiveWriter(path) as writer:
+            writer.write(record)
+    else:
+        with open(path, 'a') as record_file:
+            record_file.write(json.dumps(record) + '\n')
+
+
+def game_end(data, offset):
+    """
+    Offset after the archive game at the offset, without decoding the game
+    :raise ValueError: when the game is cut off
+    """
+    if offset + GAME.size > len(data):
+        raise ValueError('Game record cut off')
+    size, first, wrong_move_color, flags, score1, score2, name1, name2, length = GAME.unpack_from(data, offset)
+    moves = offset + GAME.size + name1 + name2
+    end = moves + length
+    if flags & TIMES and end <= len(data):
+        end += 2 * (length - data[moves:end].count(PASS))
+    if end > len(data):
+        raise ValueError('Game record cut off')
+    return end
+
+
+def _map_archive(archive_file, path):
+    """ Memory map of the archive, None if it holds no games """
+    header = archive_file.read(HEADER.size)
+    if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION):
+        raise ValueError('%s is not a game archive of version %d' % (path, VERSION))
+    if os.path.getsize(path) == HEADER.size:
+        return None
+    return mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_archive(path, start=None, end=None):
+    """
+    Streams the games of an archive, the file is memory mapped - memory does not grow with the file.
+    A game cut off at the end of the file (a writer still running or killed) ends the stream.
+    :param start: offset of the first game to read, a game boundary from split_games - None for the first game
+    :param end: games starting at this offset or later are not read, None for all
+    :return: iterator of GameRecord
+    :raise ValueError: when the file is not an archive
+    """
+    with open(path, 'rb') as archive_file:
+        data = _map_archive(archive_file, path)
+    if data is None:
+        return
+    try:
+        offset = HEADER.size if start is None else max(start, HEADER.size)
+        end = len(data) if end is None else min(end, len(data))
+        while offset < end:
+            try:
+                record, offset = GameRecord.unpack_from(data, offset)
+            except ValueError:
+                break
+            yield record
+    finally:
+        data.close()
+
+
+def is_archive_file(path):
+    with open(path, 'rb') as games_file:
+        return games_file.read(len(MAGIC)) == MAGIC
+
+
+def split_games(path, parts):
+    """
+    Byte ranges of about equal size, every game of the file is in exactly one of them - for reading one file
+    by several processes with read_games
+    :return: list of (start, end) offsets, at most parts of them
+    """
+    file_size = os.path.getsize(path)
+    if not is_archive_file(path):
+        # a text line belongs to the range its first byte is in
+        bounds = [file_size * part // parts for part in range(parts + 1)]
+        return [(bounds[part], bounds[part + 1]) for part in range(parts) if bounds[part] < bounds[part + 1]]
+    with open(path, 'rb') as archive_file:
+        data = _map_archive(archive_file, path)
+    if data is None:
+        return []
+    try:
+        # the headers are walked only, the games are decoded by the readers of the ranges
+        starts = [HEADER.size]
+        offset = HEADER.size
+        next_bound = 1
+        while offset < len(data) and next_bound < parts:
+            try:
+                offset = game_end(data, offset)
+            except ValueError:
+                break
+            if offset >= (len(data) - HEADER.size) * next_bound // parts + HEADER.size:
+                starts.append(offset)
+                next_bound += 1
+    finally:
+        data.close()
+    starts.append(file_size)
+    return [(starts[part], starts[part + 1]) for part in range(len(starts) - 1) if starts[part] < starts[part + 1]]
+
+
+def read_games(path, board_size=8, start=None, end=None):
+    """
+    Streams the games of an archive, a JSON lines file or a transcript file (one game per line)
+    :param board_size: board size of the transcripts
+    :param start: first byte of the range to read, from split_games - None for the whole file
+    :param end: end of the range, None for the end of the file
+    :return: iterator of GameRecord
+    """
+    if is_archive_file(path):
+        for record in read_archive(path, start, end):
+            yield record
+        return
+    with open(path, 'rb') as games_file:
+        if start:
+            # the line the range starts in belongs to the previous range
+            games_file.seek(start - 1)
+            games_file.readline()
+        position = games_file.tell()
+        for line in games_file:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            line = line.decode('utf-8').strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                yield GameRecord.from_dict(json.loads(line))
+            else:
+                yield GameRecord.from_transcript(line, board_size)
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "o:s:")
+    options = dict(choices)
+    board_size = int(options.get('-s', 8))
+    if not args:
+        print('No game files given.')
+        sys.exit(1)
+    if '-o' in options:
+        games = 0
+        with ArchiveWriter(options['-o']) as writer:
+            for path in args:
+                for record in read_games(path, board_size):
+                    writer.write(record)
+                    games += 1
+        print('%d games appended to %s' % (games, options['-o']))
+    else:
+        for path in args:
+            for record in read_games(path, board_size):
+                print('%s %d:%d %s' % (' - '.join(record.players), record.score[0], record.score[1],
+                                       record.transcript()))
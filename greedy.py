@@ -1,8 +1,8 @@
-# board size 8x8
+# board size 8x8, 6x6 up to 12x12 are supported too
 # 2 rounds
 # 1 second per move
 # single thread only
-import random
+from bitboard import geometry, iter_squares, popcount
 
 
 class Move:
@@ -40,59 +40,16 @@ class MyPlayer:
         valid_moves = []
         # returns all valid moves for given symbol on a current board
         # Check all fields, and find out how many points I get if I play there
-        for x in range(8):
-            for y in range(8):
-                # exam free spaces only
-                if board[x][y] == self.space:
-                    gain = self.check_move(board, x, y, symbol)
-                    if gain > 0:
-                        valid_moves.append(Move((x, y), gain))
+        board_geometry = geometry(len(board))
+        own, opp = board_geometry.from_list(board, symbol, self.space)
+        for square in iter_squares(board_geometry.legal_moves(own, opp)):
+            gain = popcount(board_geometry.flips(square, own, opp))
+            valid_moves.append(Move(board_geometry.coords(square), gain))
         if valid_moves == []:
             return None
         else:
             return valid_moves
 
-    def check_move(self, board, x, y, symbol):
-        # inspect if the field is a valid move for a given symbol
-        # Check all directions for other symbol and count the possible points
-        # h and v are directional vectors
-        points = 0
-        for h in [-1, 0, 1]:
-            for v in [-1, 0, 1]:
-                if v != 0 or h != 0:
-                    if is_field_legit(x + h, y + v):
-                        examined = board[x + h][y + v]
-                        if examined != self.space and examined != symbol:
-                            points += self.count_points(board, x + h, y + v, h, v)
-        # return points gain for current move
-        # returns 0 if the move is not valid
-        return points
-
-    def count_points(self, board, x, y, horizontal_direction, vertical_direction):
-        # Count how many stones are in a given direction
-        # k is a scalar multipliers for directional vectors
-        # returns 0 if the move is not valid - space found between stones
-        symbol = board[x][y]
-        if symbol == self.space:
-            return 0
-        count = 1
-        for k in range(1, 9):
-            if is_field_legit(x + k * horizontal_direction, y + k * vertical_direction):
-                if board[x + k * horizontal_direction][y + k * vertical_direction] == self.space:
-                    return 0
-                elif board[x + k * horizontal_direction][y + k * vertical_direction] == symbol:
-                    count += 1
-                else:
-                    return count
-            else:
-                return 0
-        return count
-
-
-def is_field_legit(x, y):
-    # checks if the field is located within a board
-    return 0 <= x < 8 and 0 <= y < 8
-
 
 # Tests
 if __name__ == "__main__":
@@ -1,23 +1,42 @@
 import random_player
 import greedy
-from game_board import GameBoard
+from game_board import GameBoard, BOARD_SIZES
+from player_process import PlayerProcess, MoveTimeout, PlayerCrash, MOVE_TIME_LIMIT
 import time, getopt, sys
+from game_record import append_game
 import player
 import dummier
 
 
+# Verbosity levels
+SILENT = 0  # no output at all
+SUMMARY = 1  # final score only
+FULL = 2  # every move and board
+
+USAGE = '''Usage: python headless_reversi_creator.py [-v N] [-r FILE] [-s N] [player [player]]
+    -v N     verbosity, 0 silent, 1 final score, 2 everything (default 2)
+    -r FILE  appends the game record, a binary archive for names ending with .rga
+    -s N     board size, one of %s (default 8)''' % ', '.join(str(size) for size in BOARD_SIZES)
+
+
 class HeadlessReversiCreator(object):
     '''
 	Creator of the Reversi game without the GUI.
 	'''
 
-    def __init__(self, player1, player1_color, player2, player2_color, board_size=8):
+    def __init__(self, player1, player1_color, player2, player2_color, board_size=8, verbosity=FULL,
+                 record_path=None, time_limit=MOVE_TIME_LIMIT):
         '''
 		:param player1: Instance of first player
 		:param player1_color: color of player1
 		:param player2: Instance of second player
 		:param player1_color: color of player2
 		:param boardSize: Board will have size [boardSize x boardSize]
+		:param verbosity: SILENT, SUMMARY or FULL output
+		:param record_path: file the game record is appended to at the end of the game,
+			a binary archive for names ending with .rga, JSON lines otherwise
+		:param time_limit: seconds for one move, the players then run in their own processes.
+			None plays without the limit in this process.
 		'''
         self.board = GameBoard(board_size, player1_color, player2_color)
         self.player1 = player1
@@ -26,48 +45,135 @@ class HeadlessReversiCreator(object):
         self.current_player_color = player1_color
         self.player1_color = player1_color
         self.player2_color = player2_color
+        # color of the player who lost by an incorrect or too slow move, None if the game finished correctly
+        self.wrong_move_color = None
+        self.time_limit = time_limit
+        self.verbosity = verbosity
+        self.record_path = record_path
+        self.moves = []
+        self.move_times_ms = []
 
     def play_game(self):
         '''
 		This function contains game loop that plays the game.
 		'''
-        # TODO: Time limit for move
+        workers = {}
+        try:
+            if self.time_limit is not None:
+                for player, color in ((self.player1, self.player1_color), (self.player2, self.player2_color)):
+                    try:
+                        workers[color] = PlayerProcess(player, self.time_limit)
+                    except PlayerCrash:
+                        if self.verbosity >= SUMMARY:
+                            print('Player %s could not start' % (player.name))
+                            self.print_winner_by_default(color)
+                        self.wrong_move_color = color
+                        break
+            if self.wrong_move_color is None:
+                self.game_loop(workers)
+        finally:
+            for worker in workers.values():
+                worker.close()
+        if self.record_path is not None:
+            self.write_record()
+
+    def game_loop(self, workers):
+        '''
+		:param workers: PlayerProcess for each color, empty to call the players directly
+		'''
         correct_finish = True
+        full = self.verbosity >= FULL
         while self.board.can_play(self.current_player, self.current_player_color):
-            startTime = time.time()
-            move = self.current_player.move(self.board.get_board_copy())
-            endTime = time.time()
-            moveTime = (endTime - startTime) * 1000
+            if workers:
+                try:
+                    move, moveTime = workers[self.current_player_color].move(self.board.get_board_copy())
+                except MoveTimeout:
+                    if self.verbosity >= SUMMARY:
+                        print('Player %s move took too long - killed' % (self.current_player.name))
+                        self.print_winner_by_default()
+                    correct_finish = False
+                    self.wrong_move_color = self.current_player_color
+                    break
+                except PlayerCrash as error:
+                    # an exception or a dead process loses like a wrong move
+                    if self.verbosity >= SUMMARY:
+                        print(error)
+                        self.print_winner_by_default()
+                    correct_finish = False
+                    self.wrong_move_color = self.current_player_color
+                    break
+            else:
+                startTime = time.time()
+                move = self.current_player.move(self.board.get_board_copy())
+                endTime = time.time()
+                moveTime = (endTime - startTime) * 1000
+            self.moves.append([self.current_player_color, move[0], move[1]])
+            self.move_times_ms.append(round(moveTime, 3))
 
-            print('Player %s wants move [%d,%d]. Move takes %.3f ms.' % (
-                self.current_player.name, move[0], move[1], moveTime))
+            if full:
+                print('Player %s wants move [%d,%d]. Move takes %.3f ms.' % (
+                    self.current_player.name, move[0], move[1], moveTime))
             if self.board.is_correct_move(move, self.current_player, self.current_player_color):
-                print('Move is correct')
+                if full:
+                    print('Move is correct')
                 self.board.play_move(move, self.current_player, self.current_player_color)
 
             else:
-                print('Player %s made the wrong move [%d,%d]' % (self.current_player.name, move[0], move[1]))
-                print('Game over.')
-                if self.current_player_color == self.player1_color:
-                    print('Winner is player %s.' % (self.player2.name))
-                else:
-                    print('Winner is player %s.' % (self.player1.name))
+                if self.verbosity >= SUMMARY:
+                    print('Player %s made the wrong move [%d,%d]' % (self.current_player.name, move[0], move[1]))
+                    self.print_winner_by_default()
                 correct_finish = False
+                self.wrong_move_color = self.current_player_color
                 break
 
             self.change_player()
             if not self.board.can_play(self.current_player, self.current_player_color):
-                print('No possible move for Player %d' % (self.current_player_color))
+                if full:
+                    print('No possible move for Player %d' % (self.current_player_color))
                 self.change_player()
                 if self.board.can_play(self.current_player, self.current_player_color):
-                    print('Player %d plays again ' % (self.current_player_color))
-                else:
+                    if full:
+                        print('Player %d plays again ' % (self.current_player_color))
+                elif full:
                     print('Game over')
 
-            self.board.print_board()
-        if correct_finish:
+            if full:
+                self.board.print_board()
+        if correct_finish and self.verbosity >= SUMMARY:
             self.printFinalScore()
 
+    def print_winner_by_default(self, loser_color=None):
+        '''
+		:param loser_color: color of the player who lost, the current player if None
+		'''
+        print('Game over.')
+        if loser_color is None:
+            loser_color = self.current_player_color
+        if loser_color == self.player1_color:
+            print('Winner is player %s.' % (self.player2.name))
+        else:
+            print('Winner is player %s.' % (self.player1.name))
+
+    def get_record(self):
+        '''
+		:return: dict with the players, moves, move times and the final score of the game
+		'''
+        return {
+            'players': [self.player1.name, self.player2.name],
+            'colors': [self.player1_color, self.player2_color],
+            'board_size': self.board.board_size,
+            'moves': self.moves,
+            'times_ms': self.move_times_ms,
+            'score': self.board.get_score(),
+            'wrong_move_color': self.wrong_move_color,
+        }
+
+    def write_record(self):
+        '''
+		Appends the game record to the archive or as one JSON line - the only write of the game.
+		'''
+        append_game(self.record_path, self.get_record())
+
     def change_player(self):
         '''
 		Change the current_player
@@ -80,14 +186,7 @@ class HeadlessReversiCreator(object):
             self.current_player_color = self.player1_color
 
     def printFinalScore(self):
-        p1Stones = 0
-        p2Stones = 0
-        for x in range(self.board.board_size):
-            for y in range(self.board.board_size):
-                if self.board.board[x][y] == 0:
-                    p1Stones += 1
-                if self.board.board[x][y] == 1:
-                    p2Stones += 1
+        p1Stones, p2Stones = self.board.get_score()
 
         print('\n\n-----------------------------\n')
         print('Final score:\n\nPlayer%d:Player%d\n\t[%d:%d]\n' % (
@@ -102,7 +201,16 @@ class HeadlessReversiCreator(object):
 
 
 if __name__ == "__main__":
-    (choices, args) = getopt.getopt(sys.argv[1:], "")
+    (choices, args) = getopt.getopt(sys.argv[1:], "v:r:s:")
+    options = dict(choices)
+    verbosity = int(options.get('-v', FULL))
+    record_path = options.get('-r')
+    board_size = options.get('-s', '8')
+    if not board_size.isdigit() or int(board_size) not in BOARD_SIZES:
+        print('Unsupported board size: %s\n' % board_size)
+        print(USAGE)
+        sys.exit(2)
+    board_size = int(board_size)
     p1_color = 0
     p2_color = 1
 
@@ -113,7 +221,7 @@ if __name__ == "__main__":
         #p1 = random_player.MyPlayer(p1_color, p2_color)
         p1 = dummier.MyPlayer(p1_color, p2_color)
         p2 = player.MyPlayer(p2_color, p1_color)
-        game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8)
+        game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, board_size, verbosity, record_path)
         game.play_game()
 
     elif len(args) == 1:
@@ -123,7 +231,7 @@ if __name__ == "__main__":
             player_module = __import__(args[0])
             p2 = player_module.MyPlayer(p2_color, p1_color)
 
-            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8)
+            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, board_size, verbosity, record_path)
             game.play_game()
 
         except ImportError:
@@ -150,5 +258,5 @@ if __name__ == "__main__":
             print('Error: Cannot import given player: %s.' % (args[1]))
 
         if importsCorrect:
-            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8)
+            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, board_size, verbosity, record_path)
             game.play_game()
@@ -0,0 +1,93 @@
+"""
+Move ordering for the alpha beta search.
+
+The search asks the ordering object to sort the moves of every node and
+reports every beta cutoff back to it. Moves that caused cutoffs before
+are tried first, so further cutoffs happen earlier.
+"""
+
+
+class MoveOrdering:
+    """Keeps the generator order, only the transposition table move goes first"""
+
+    def new_search(self):
+        """ Called once at the start of every move """
+
+    def set_board(self, square_values):
+        """
+        Called when the board size changes
+        :param square_values: list of rows with the strategic value of each field
+        """
+
+    def order(self, moves, ply, table_move=None):
+        """
+        Sorts the moves in place, the most promising first
+        :param moves: list of field indexes
+        :param ply: distance of the node from the root
+        :param table_move: best move stored in the transposition table
+        """
+        if table_move in moves:
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+
+    def cutoff(self, move, ply, depth):
+        """
+        Records that the move caused a beta cutoff
+        :param move: field index of the move
+        :param ply: distance of the node from the root
+        :param depth: remaining depth of the node
+        """
+
+
+class HeuristicOrdering(MoveOrdering):
+    """
+    Transposition table move first, then killer moves of the ply,
+    then the history table and finally the static value of the field
+    """
+
+    def __init__(self, square_values, killers_per_ply=2):
+        """
+        :param square_values: list of rows with the strategic value of each field
+        :param killers_per_ply: how many killer moves are remembered for each ply
+        """
+        self.killers_per_ply = killers_per_ply
+        self.set_board(square_values)
+
+    def set_board(self, square_values):
+        values = [value for row in square_values for value in row]
+        # shift the field value to a small positive number - the history counts go above it
+        offset = -min(values)
+        self.prior = [value + offset for value in values]
+        self.prior_range = max(self.prior) + 1
+        self.killers = []
+        self.history = [0] * len(values)
+
+    def new_search(self):
+        # killers belong to the plies of the previous root, history just fades out
+        self.killers = []
+        self.history = [count >> 1 for count in self.history]
+
+    def order(self, moves, ply, table_move=None):
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+        prior = self.prior
+        prior_range = self.prior_range
+        top = 1 << 40
+
+        def rank(field):
+            if field == table_move:
+                return top + 2 * self.killers_per_ply
+            if field in killers:
+                return top + self.killers_per_ply - killers.index(field)
+            return history[field] * prior_range + prior[field]
+
+        moves.sort(key=rank, reverse=True)
+
+    def cutoff(self, move, ply, depth):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killers_per_ply:]
+        self.history[move] += depth * depth
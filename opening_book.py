@@ -0,0 +1,227 @@
+"""
+Opening book - statistics of the moves played in the first plies of recorded games.
+
+Positions are keyed by symmetry.canonical_key, a hash of the smallest of the
+8 rotated and mirrored versions of the position, so all symmetric positions
+share their statistics. Moves are stored in the canonical orientation and
+turned back to the orientation of the board on lookup.
+
+The book is a binary file of records sorted by the key, memory mapped and
+searched by bisection:
+
+    header   4 byte magic, 1 byte version
+    records  position key (uint64), canonical move square (uint8), games (uint32),
+             sum of the final disc differences of the mover (int32), 17 bytes little endian
+
+The builder reads game records (tournament.py -r, headless_reversi_creator.py -r,
+selfplay.py -r), JSON lines or archives, and merges them into an existing book:
+
+>> python opening_book.py -o opening_book.bin games.jsonl more_games.rga
+>> python opening_book.py -o opening_book.bin -p 16 games.jsonl
+>> python opening_book.py -b opening_book.bin                          prints the book moves of the start position
+
+Options:
+    -o FILE      book file to build or grow (default the file the player loads)
+    -p N         plies of every game that go into the book (default 12)
+    -b FILE      book to print the start position moves of
+"""
+import getopt
+import itertools
+import mmap
+import os
+import struct
+import sys
+
+import symmetry
+from bitboard import GEOMETRY, legal_moves
+from game_record import read_games
+
+MAGIC = b'RVOB'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+RECORD = struct.Struct('<QBIi')
+KEY = struct.Struct('<Q')
+
+BOOK_PLIES = 12
+MIN_GAMES = 2  # a move needs this many games to be played from the book
+
+# default book file, used by the player when it exists
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+
+def position_key(own, opp):
+    """
+    Symmetry normalized hash of the position with own stones to move
+    :return: (key, symmetry that maps the position to its canonical form)
+    """
+    return symmetry.canonical_key(own, opp, 8), symmetry.canonical(own, opp, 8)[2][0]
+
+
+class OpeningBook:
+    """Read only view of a book file"""
+
+    size = 8  # board size the tables are made for
+
+    def __init__(self, path=BOOK_FILE, min_games=MIN_GAMES):
+        self.path = path
+        self.min_games = min_games
+        self.data = None
+        self.count = 0
+        self.open()
+
+    def open(self):
+        with open(self.path, 'rb') as book_file:
+            header = book_file.read(HEADER.size)
+            if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION):
+                raise ValueError('%s is not an opening book of version %d' % (self.path, VERSION))
+            self.count = (os.path.getsize(self.path) - HEADER.size) // RECORD.size
+            if self.count:
+                self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    def __getstate__(self):
+        # the memory map cannot be pickled - the player processes open the file again
+        return {'path': self.path, 'min_games': self.min_games}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['min_games'])
+
+    def __len__(self):
+        return self.count
+
+    def records(self, key):
+        """
+        All moves of the position
+        :return: list of (canonical move, games, sum of disc differences)
+        """
+        data = self.data
+        low = 0
+        high = self.count
+        # first record with the key
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, HEADER.size + middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        while low < self.count:
+            record_key, move, games, score = RECORD.unpack_from(data, HEADER.size + low * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((move, games, score))
+            low += 1
+        return moves
+
+    def moves(self, own, opp):
+        """
+        Book moves of the position with own stones to move
+        :return: list of (field index, games, average final disc difference), the best first
+        """
+        if not self.count:
+            return []
+        key, to_canonical = position_key(own, opp)
+        valid = legal_moves(own, opp)
+        moves = []
+        for move, games, score in self.records(key):
+            square = symmetry.inverse_square(move, to_canonical)
+            # a hash collision must not play an illegal move
+            if valid >> square & 1:
+                moves.append((square, games, score / float(games)))
+        moves.sort(key=lambda move: move[2], reverse=True)
+        return moves
+
+    def lookup(self, own, opp):
+        """ Field index of the best move with enough games, None if the position is not in the book """
+        for square, games, average in self.moves(own, opp):
+            if games >= self.min_games:
+                return square
+        return None
+
+
+def game_moves(record, plies=BOOK_PLIES):
+    """
+    Book statistics of one game
+    :param record: game_record.GameRecord
+    :return: list of (position key, canonical move, disc difference of the mover), empty for unusable games
+    """
+    if record.board_size != 8 or record.wrong_move_color is not None:
+        return []
+    score = [0, 0]
+    for color, stones in zip(record.colors, record.score):
+        score[color] = stones
+    stones = list(GEOMETRY.start_position())
+    result = []
+    for color, square in itertools.islice(record.plays(), plies):
+        own = stones[color]
+        opp = stones[1 - color]
+        key, move = symmetry.canonical_move(own, opp, square)
+        result.append((key, move, score[color] - score[1 - color]))
+        flipped = GEOMETRY.flips(square, own, opp)
+        stones[color] = own | flipped | (1 << square)
+        stones[1 - color] = opp ^ flipped
+    return result
+
+
+def read_book(path):
+    """ Statistics of an existing book file as a dict (key, move) -> [games, score] """
+    statistics = {}
+    with open(path, 'rb') as book_file:
+        data = book_file.read()
+    if len(data) < HEADER.size or HEADER.unpack_from(data) != (MAGIC, VERSION):
+        raise ValueError('%s is not an opening book of version %d' % (path, VERSION))
+    for offset in range(HEADER.size, len(data) - RECORD.size + 1, RECORD.size):
+        key, move, games, score = RECORD.unpack_from(data, offset)
+        statistics[(key, move)] = [games, score]
+    return statistics
+
+
+def write_book(path, statistics):
+    """ Writes the statistics sorted by the key, through a temporary file so readers never see half a book """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION))
+        for (key, move), (games, score) in sorted(statistics.items()):
+            book_file.write(RECORD.pack(key, move, games, score))
+    os.replace(temporary, path)
+
+
+def build(path, record_paths, plies=BOOK_PLIES):
+    """
+    Adds the games of the record files to the book, the book is created if it does not exist
+    :return: number of games added
+    """
+    statistics = read_book(path) if os.path.exists(path) else {}
+    games = 0
+    for record_path in record_paths:
+        for record in read_games(record_path):
+            moves = game_moves(record, plies)
+            if moves:
+                games += 1
+            for key, move, score in moves:
+                entry = statistics.setdefault((key, move), [0, 0])
+                entry[0] += 1
+                entry[1] += score
+    write_book(path, statistics)
+    return games
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "o:p:b:")
+    options = dict(choices)
+    if '-b' in options:
+        book = OpeningBook(options['-b'])
+        own, opp = GEOMETRY.start_position()
+        print('%d records' % len(book))
+        for square, games, average in book.moves(own, opp):
+            print('%s  %d games, average %+.1f discs' % (GEOMETRY.coords(square), games, average))
+    elif args:
+        output = options.get('-o', BOOK_FILE)
+        added = build(output, args, int(options.get('-p', BOOK_PLIES)))
+        print('%d games added to %s' % (added, output))
+    else:
+        print('No game records given.')
@@ -0,0 +1,154 @@
+"""
+Root parallel search - the root moves are split among worker processes.
+
+Every worker runs its own iterative deepening over its share of the root
+moves with its own transposition table, until the common deadline. The
+deepest depth finished by all workers decides the move. The worker
+players stay alive between the moves, so their tables are reused.
+
+The tournament rules allow a single thread only, so the player searches
+in one thread unless it is given more processes. It also falls back to one
+thread inside a daemonic process (e.g. a player process of the game
+creator), which cannot start a process pool. Analysis and data generation:
+
+>> python parallel_search.py            compares the single thread and the parallel search on the sample board
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import player
+from bitboard import popcount
+from symmetry import distinct_moves
+
+# tournament rules - one thread
+PROCESSES = 1
+
+# the workers get this long after the deadline to send their results
+RESULT_MARGIN = 0.1
+
+# worker players by (color, options) - kept between the moves of the process
+_searchers = {}
+
+
+def _searcher(color, options):
+    key = (color, tuple(sorted(options.items())))
+    searcher = _searchers.get(key)
+    if searcher is None:
+        searcher = player.MyPlayer(color, 1 - color, book=None, **options)
+        _searchers[key] = searcher
+    return searcher
+
+
+def search_share(job):
+    """
+    Iterative deepening over a share of the root moves, run in a worker process
+    :param job: (stones, board size, color to move, field indexes of the moves, deadline, player options)
+    :return: list of (depth, best move of the share, its score) for every finished depth
+    """
+    stones, size, color, moves, deadline, options = job
+    searcher = _searcher(color, options)
+    if searcher.size != size:
+        searcher.set_board_size(size)
+    stones = list(stones)
+    moves = list(moves)
+    key = searcher.start_search(stones, deadline)
+    evaluate = searcher.evaluation()
+    empty_fields = searcher.squares - popcount(stones[0] | stones[1])
+    results = []
+    for depth in range(1, player.MAX_DEPTH + 1):
+        try:
+            move = searcher.search_moves(stones, moves, depth, evaluate, key)
+        except player.SearchTimeout:
+            break
+        results.append((depth, move.move, move.points))
+        # the best move goes first in the next iteration
+        moves.remove(move.move)
+        moves.insert(0, move.move)
+        if depth >= empty_fields:
+            break
+    searcher.deadline = float('inf')
+    return results
+
+
+def split_moves(moves, shares):
+    """ Deals the moves round robin, so every share gets good and bad moves """
+    return [moves[i::shares] for i in range(shares) if moves[i::shares]]
+
+
+class MyPlayer(player.MyPlayer):
+    """player.MyPlayer with the root moves searched by a pool of processes"""
+
+    def __init__(self, my_color, opponent_color, processes=PROCESSES, **options):
+        """
+        :param processes: worker processes, 1 searches in this thread, None uses all cores
+        :param options: keyword arguments of player.MyPlayer, also used by the workers
+        """
+        player.MyPlayer.__init__(self, my_color, opponent_color, **options)
+        self.processes = processes if processes is not None else os.cpu_count()
+        # the workers build their own players from the plain options - evaluator and ordering stay the defaults
+        self.options = dict((name, value) for name, value in options.items()
+                            if name in ('tt_size', 'tt_policy', 'tt_eviction', 'search', 'aspiration_window'))
+        self.pool = None
+
+    def __getstate__(self):
+        # the pool cannot be pickled - a copy of the player starts its own
+        state = player.MyPlayer.__getstate__(self)
+        state['pool'] = None
+        return state
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def parallel(self):
+        return self.processes > 1 and not multiprocessing.current_process().daemon
+
+    def iterative_deepening(self, stones, key, empty_fields):
+        moves = distinct_moves(stones[self.my_color], stones[self.opponent_color],
+                               [move.move for move in self.valid_moves], self.size)
+        if not self.parallel() or len(moves) == 1:
+            return player.MyPlayer.iterative_deepening(self, stones, key, empty_fields)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.processes)
+        # most promising moves first, so they are dealt to different workers
+        self.ordering.order(moves, 0)
+        jobs = [(tuple(stones), self.size, self.my_color, share, self.deadline, self.options)
+                for share in split_moves(moves, self.processes)]
+        futures = [self.pool.submit(search_share, job) for job in jobs]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(max(self.deadline - time.time(), 0) + RESULT_MARGIN))
+            except TimeoutError:
+                # the worker is late - its share counts as unfinished
+                results.append([])
+        depth = min(len(result) for result in results)
+        self.depth_reached = depth
+        if depth == 0:
+            # some share did not finish even depth 1 - take the best of the shares that did
+            finished = [result[-1] for result in results if result]
+            if not finished:
+                return moves[0]
+            return max(finished, key=lambda result: result[2])[1]
+        return max((result[depth - 1] for result in results), key=lambda result: result[2])[1]
+
+
+if __name__ == "__main__":
+    sample_board = [
+        [-1, -1, -1, -1, -1, -1, -1, 0],
+        [-1, -1, -1, 1, -1, -1, 0, -1],
+        [-1, -1, -1, -1, 1, 0, 1, 1],
+        [-1, -1, -1, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, -1, -1, -1],
+        [-1, -1, 0, -1, 0, -1, -1, -1],
+        [-1, -1, -1, -1, -1, -1, -1, -1],
+    ]
+    for processes in (1, os.cpu_count()):
+        searcher = MyPlayer(1, 0, processes)
+        move = searcher.move(sample_board)
+        print('%d processes: move %s, depth %d' % (processes, move, searcher.depth_reached))
+        searcher.close()
@@ -0,0 +1,259 @@
+"""
+Pattern evaluation - edge, corner region and diagonal lookup tables.
+
+Every pattern is a fixed list of squares. The state of its squares (empty,
+own, opponent) is a base 3 number that indexes a table of weights, the
+evaluation is the sum of the weights of all pattern instances on the board.
+Rotated and mirrored instances of a pattern share one table. The squares
+of each instance are gathered from the bitboards with shifts, masks and
+multiplications, never square by square.
+
+The weights depend on the game phase (number of empty fields) and are
+stored in a compact binary file:
+
+    header   4 byte magic, 1 byte version, 1 byte number of phases
+    tables   for every phase, for every pattern in PATTERNS order,
+             3 ** len(squares) little endian signed 16 bit weights
+
+>> python pattern_eval.py -o pattern_weights.bin     writes the weights derived from the board mask
+>> python pattern_eval.py -w pattern_weights.bin     evaluates the sample board with the file weights
+"""
+import array
+import getopt
+import os
+import struct
+import sys
+
+from bitboard import GEOMETRY, popcount
+
+MAGIC = b'RVPW'
+VERSION = 1
+HEADER = struct.Struct('<4sBB')
+PHASES = 4
+WEIGHT_LIMIT = 32767
+
+# evaluation is clamped to this - it must stay below the score of a won game
+MAX_VALUE = 1000
+
+# default weights file, used by the player when it exists
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pattern_weights.bin')
+
+
+def _squares(cells):
+    return [GEOMETRY.square(r, c) for r, c in cells]
+
+
+# squares of every instance of a pattern, bit i of the gathered pattern is squares[i]
+PATTERNS = [
+    ('edge', [
+        _squares((0, i) for i in range(8)),
+        _squares((7, i) for i in range(8)),
+        _squares((i, 0) for i in range(8)),
+        _squares((i, 7) for i in range(8)),
+    ]),
+    ('corner', [
+        _squares((r, c) for r in (0, 1, 2) for c in (0, 1, 2)),
+        _squares((r, c) for r in (0, 1, 2) for c in (7, 6, 5)),
+        _squares((r, c) for r in (7, 6, 5) for c in (0, 1, 2)),
+        _squares((r, c) for r in (7, 6, 5) for c in (7, 6, 5)),
+    ]),
+    ('diagonal', [
+        _squares((i, i) for i in range(8)),
+        _squares((7 - i, i) for i in range(8)),
+    ]),
+]
+TABLE_SIZES = [3 ** len(instances[0]) for name, instances in PATTERNS]
+
+# base 3 value of a gathered bit pattern - the opponent stones count twice
+TERNARY = [sum(3 ** i for i in range(10) if bits >> i & 1) for bits in range(1 << 10)]
+REVERSED = [int('{:08b}'.format(byte)[::-1], 2) for byte in range(256)]
+
+FILE_A = 0x0101010101010101
+COLUMN_MAGIC = 0x0102040810204080  # gathers the bits of file A into the top byte
+DIAGONAL = 0x8040201008040201
+ANTI_DIAGONAL = 0x0102040810204080
+
+
+def gather(bb):
+    """
+    Bits of every pattern instance of the bitboard
+    :return: (edge bits, corner bits, diagonal bits) - one number per instance in PATTERNS order
+    """
+    row0 = bb & 255
+    row1 = (bb >> 8) & 255
+    row2 = (bb >> 16) & 255
+    row5 = (bb >> 40) & 255
+    row6 = (bb >> 48) & 255
+    row7 = bb >> 56
+    edges = (row0, row7,
+             ((bb & FILE_A) * COLUMN_MAGIC >> 56) & 255,
+             (((bb >> 7) & FILE_A) * COLUMN_MAGIC >> 56) & 255)
+    corners = (row0 & 7 | (row1 & 7) << 3 | (row2 & 7) << 6,
+               REVERSED[row0] & 7 | (REVERSED[row1] & 7) << 3 | (REVERSED[row2] & 7) << 6,
+               row7 & 7 | (row6 & 7) << 3 | (row5 & 7) << 6,
+               REVERSED[row7] & 7 | (REVERSED[row6] & 7) << 3 | (REVERSED[row5] & 7) << 6)
+    diagonals = (((bb & DIAGONAL) * FILE_A >> 56) & 255,
+                 ((bb & ANTI_DIAGONAL) * FILE_A >> 56) & 255)
+    return edges, corners, diagonals
+
+
+def pattern_indexes(own, opp):
+    """
+    Table index of every pattern instance, own stones are 1 and opponent stones 2
+    :return: list with a list of instance indexes for every pattern
+    """
+    return [[TERNARY[own_bits] + 2 * TERNARY[opp_bits] for own_bits, opp_bits in zip(own_group, opp_group)]
+            for own_group, opp_group in zip(gather(own), gather(opp))]
+
+
+def game_phase(empties, phases=PHASES):
+    """ Phase 0 is the opening, phases - 1 the endgame """
+    return (60 - min(empties, 60)) * phases // 61
+
+
+class PatternEvaluator:
+    """Sum of the pattern weights of the game phase, from the view of the color to move"""
+
+    size = 8  # board size the tables are made for
+
+    def __init__(self, tables):
+        """
+        :param tables: for every phase a list of weight tables in PATTERNS order
+        """
+        for phase_tables in tables:
+            if [len(table) for table in phase_tables] != TABLE_SIZES:
+                raise ValueError('Pattern tables must have sizes %s' % TABLE_SIZES)
+        self.tables = tables
+        self.phases = len(tables)
+
+    @classmethod
+    def from_file(cls, path=WEIGHTS_FILE):
+        return cls(load_weights(path))
+
+    @classmethod
+    def from_mask(cls, board_mask, phases=PHASES):
+        return cls(mask_weights(board_mask, phases))
+
+    def evaluate(self, stones, symbol):
+        """
+        Evaluates board for the given symbol
+        :param stones: bitboards indexed by color
+        :param symbol: color to evaluate for
+        """
+        own = stones[symbol]
+        opp = stones[1 - symbol]
+        empties = 64 - popcount(own | opp)
+        edge, corner, diagonal = self.tables[game_phase(empties, self.phases)]
+        own_edges, own_corners, own_diagonals = gather(own)
+        opp_edges, opp_corners, opp_diagonals = gather(opp)
+        ternary = TERNARY
+        score = 0
+        for own_bits, opp_bits in zip(own_edges, opp_edges):
+            score += edge[ternary[own_bits] + 2 * ternary[opp_bits]]
+        for own_bits, opp_bits in zip(own_corners, opp_corners):
+            score += corner[ternary[own_bits] + 2 * ternary[opp_bits]]
+        for own_bits, opp_bits in zip(own_diagonals, opp_diagonals):
+            score += diagonal[ternary[own_bits] + 2 * ternary[opp_bits]]
+        if score > MAX_VALUE:
+            return MAX_VALUE
+        if score < -MAX_VALUE:
+            return -MAX_VALUE
+        return score
+
+
+def mask_weights(board_mask, phases=PHASES):
+    """
+    Weights that reproduce a board mask evaluation on the squares covered by the patterns.
+    The value of a square is split among all instances that cover it.
+    """
+    values = [value for row in board_mask for value in row]
+    coverage = [0] * len(values)
+    for name, instances in PATTERNS:
+        for squares in instances:
+            for square in squares:
+                coverage[square] += 1
+    tables = []
+    for name, instances in PATTERNS:
+        shares = [values[square] / float(coverage[square]) for square in instances[0]]
+        table = []
+        for index in range(3 ** len(shares)):
+            score = 0.0
+            for share in shares:
+                state = index % 3
+                index //= 3
+                if state == 1:
+                    score += share
+                elif state == 2:
+                    score -= share
+            table.append(int(round(score)))
+        tables.append(table)
+    return [[list(table) for table in tables] for _ in range(phases)]
+
+
+def save_weights(path, tables):
+    """ Writes the weight tables of every phase, weights are clamped to 16 bits """
+    with open(path, 'wb') as weights_file:
+        weights_file.write(HEADER.pack(MAGIC, VERSION, len(tables)))
+        for phase_tables in tables:
+            for table in phase_tables:
+                weights = array.array('h', (max(-WEIGHT_LIMIT, min(WEIGHT_LIMIT, int(round(w)))) for w in table))
+                if sys.byteorder == 'big':
+                    weights.byteswap()
+                weights_file.write(weights.tobytes())
+
+
+def load_weights(path):
+    """
+    Reads the weight tables written by save_weights
+    :return: for every phase a list of weight tables in PATTERNS order
+    :raise ValueError: when the file is not a pattern weights file
+    """
+    with open(path, 'rb') as weights_file:
+        data = weights_file.read()
+    if len(data) < HEADER.size:
+        raise ValueError('%s is not a pattern weights file' % path)
+    magic, version, phases = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a pattern weights file of version %d' % (path, VERSION))
+    weights = array.array('h')
+    weights.frombytes(data[HEADER.size:])
+    if sys.byteorder == 'big':
+        weights.byteswap()
+    if len(weights) != phases * sum(TABLE_SIZES):
+        raise ValueError('%s has a wrong size' % path)
+    tables = []
+    offset = 0
+    for _ in range(phases):
+        phase_tables = []
+        for size in TABLE_SIZES:
+            phase_tables.append(weights[offset:offset + size].tolist())
+            offset += size
+        tables.append(phase_tables)
+    return tables
+
+
+if __name__ == "__main__":
+    from player import BOARD_MASK
+    (choices, args) = getopt.getopt(sys.argv[1:], "o:w:")
+    options = dict(choices)
+    if '-o' in options:
+        save_weights(options['-o'], mask_weights(BOARD_MASK))
+        print('Weights written to %s' % options['-o'])
+    if '-w' in options:
+        evaluator = PatternEvaluator.from_file(options['-w'])
+    else:
+        evaluator = PatternEvaluator.from_mask(BOARD_MASK)
+    sample_board = [
+        [-1, -1, -1, -1, -1, -1, -1, 0],
+        [-1, -1, -1, 1, -1, -1, 0, -1],
+        [-1, -1, -1, -1, 1, 0, 1, 1],
+        [-1, -1, -1, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, -1, -1, -1],
+        [-1, -1, 0, -1, 0, -1, -1, -1],
+        [-1, -1, -1, -1, -1, -1, -1, -1],
+    ]
+    stones = GEOMETRY.from_list(sample_board, 0)
+    for row in sample_board:
+        print(row)
+    print('pattern value for color 0: %d, color 1: %d' % (evaluator.evaluate(stones, 0), evaluator.evaluate(stones, 1)))
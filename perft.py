@@ -0,0 +1,232 @@
+"""
+Perft - counts the leaf nodes of the game tree to a fixed depth.
+
+Every move generator of the package is run on the same positions, the
+counts must agree with each other and with the reference values. A pass
+counts as a ply, a finished game is a leaf even above the full depth.
+
+>> python perft.py                 all backends, start position to depth 6, fixed positions
+>> python perft.py -d 8 -b bitboard
+"""
+import getopt
+import sys
+import time
+
+import bitboard
+import greedy
+import player
+import random_player
+from game_board import GameBoard
+
+SPACE = -1
+
+# Leaf counts from the start position for depth 1, 2, ... (standard reversi perft)
+START_COUNTS = [4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284]
+
+# (name, board, color to move, leaf counts for depth 1, 2, ...)
+FIXED_POSITIONS = [
+    ('sample', [
+        [-1, -1, -1, -1, -1, -1, -1, 0],
+        [-1, -1, -1, 1, -1, -1, 0, -1],
+        [-1, -1, -1, -1, 1, 0, 1, 1],
+        [-1, -1, -1, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 0, 0, -1, -1, -1],
+        [-1, -1, 0, -1, 0, -1, -1, -1],
+        [-1, -1, -1, -1, -1, -1, -1, -1],
+    ], 1, [10, 92, 986, 10482, 123971]),
+    ('midgame', [
+        [-1, -1, 1, 1, 1, 1, -1, -1],
+        [-1, -1, 1, 1, 0, -1, -1, -1],
+        [1, 1, 1, 0, 1, 0, 0, -1],
+        [-1, 1, 0, 1, 1, 0, 0, -1],
+        [1, 1, 1, 0, 0, 0, 0, 0],
+        [-1, 1, 0, 0, 0, 1, -1, -1],
+        [-1, -1, 0, 1, 1, 1, -1, -1],
+        [-1, -1, -1, -1, 1, -1, -1, -1],
+    ], 0, [11, 117, 1273, 14101, 154806]),
+    ('passes', [
+        [-1, -1, -1, 0, -1, -1, -1, 1],
+        [0, -1, 0, 0, 0, 0, 1, 1],
+        [-1, 0, 0, 0, 1, 1, 1, 1],
+        [-1, 0, 0, 1, 1, 1, 1, 1],
+        [-1, -1, 0, 1, 0, 0, 1, 1],
+        [-1, 0, 0, 0, 0, 0, 0, -1],
+        [0, 1, 0, 0, 0, 0, 0, 0],
+        [-1, 0, 0, 1, 1, 1, 1, 1],
+    ], 0, [4, 44, 167, 1508, 6545, 46997]),
+]
+
+
+class BitboardBackend:
+    """bitboard.Geometry on a [color 0 stones, color 1 stones] list"""
+    name = 'bitboard'
+
+    def position(self, board):
+        return list(bitboard.GEOMETRY.from_list(board, 0, SPACE))
+
+    def moves(self, position, color):
+        return list(bitboard.iter_squares(bitboard.legal_moves(position[color], position[1 - color])))
+
+    def make(self, position, move, color):
+        flipped = bitboard.flips(move, position[color], position[1 - color])
+        position[color] |= flipped | (1 << move)
+        position[1 - color] ^= flipped
+        return flipped
+
+    def unmake(self, position, move, color, flipped):
+        position[color] ^= flipped | (1 << move)
+        position[1 - color] |= flipped
+
+
+class GameBoardBackend:
+    """GameBoard.is_correct_move on every field and GameBoard.play_move"""
+    name = 'game_board'
+
+    def position(self, board):
+        game_board = GameBoard()
+        game_board.board = board
+        return game_board
+
+    def moves(self, position, color):
+        return [(r, c) for r in range(8) for c in range(8) if position.is_correct_move((r, c), None, color)]
+
+    def make(self, position, move, color):
+        stones = (position.p1_stones, position.p2_stones)
+        position.play_move(move, None, color)
+        return stones
+
+    def unmake(self, position, move, color, stones):
+        position.p1_stones, position.p2_stones = stones
+
+
+class PlayerBackend:
+    """player.MyPlayer.generate_moves, make_move and unmake_move"""
+    name = 'player'
+
+    def __init__(self):
+        self.player = player.MyPlayer(0, 1)
+
+    def position(self, board):
+        return list(bitboard.GEOMETRY.from_list(board, 0, SPACE))
+
+    def moves(self, position, color):
+        return self.player.generate_moves(position, color)
+
+    def make(self, position, move, color):
+        return self.player.make_move(position, move, color)
+
+    def unmake(self, position, move, color, flipped):
+        self.player.unmake_move(position, move, flipped)
+
+
+class ListBackend:
+    """Nested list board, the moves are played field by field"""
+
+    def position(self, board):
+        return [list(row) for row in board]
+
+    def make(self, position, move, color):
+        own, opp = bitboard.GEOMETRY.from_list(position, color, SPACE)
+        square = bitboard.GEOMETRY.square(move[0], move[1])
+        flipped = bitboard.flips(square, own, opp)
+        for changed in bitboard.iter_squares(flipped | (1 << square)):
+            r, c = bitboard.GEOMETRY.coords(changed)
+            position[r][c] = color
+        return flipped
+
+    def unmake(self, position, move, color, flipped):
+        for changed in bitboard.iter_squares(flipped):
+            r, c = bitboard.GEOMETRY.coords(changed)
+            position[r][c] = 1 - color
+        position[move[0]][move[1]] = SPACE
+
+
+class GreedyBackend(ListBackend):
+    """greedy.MyPlayer.get_valid_moves"""
+    name = 'greedy'
+
+    def __init__(self):
+        self.greedy = [greedy.MyPlayer(0, 1), greedy.MyPlayer(1, 0)]
+
+    def moves(self, position, color):
+        return [move.move for move in self.greedy[color].get_valid_moves(position, color) or ()]
+
+
+class RandomPlayerBackend(ListBackend):
+    """random_player.MyPlayer.is_correct_move on every empty field"""
+    name = 'random_player'
+
+    def __init__(self):
+        self.random = [random_player.MyPlayer(0, 1), random_player.MyPlayer(1, 0)]
+
+    def moves(self, position, color):
+        checker = self.random[color]
+        return [(r, c) for r in range(8) for c in range(8)
+                if position[r][c] == SPACE and checker.is_correct_move([r, c], position, 8)]
+
+
+BACKENDS = [BitboardBackend, GameBoardBackend, PlayerBackend, GreedyBackend, RandomPlayerBackend]
+
+
+def perft(backend, position, color, depth):
+    """
+    :return: number of leaf nodes depth plies below the position
+    """
+    if depth == 0:
+        return 1
+    moves = backend.moves(position, color)
+    if not moves:
+        if not backend.moves(position, 1 - color):
+            # game over
+            return 1
+        return perft(backend, position, 1 - color, depth - 1)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = backend.make(position, move, color)
+        nodes += perft(backend, position, 1 - color, depth - 1)
+        backend.unmake(position, move, color, undo)
+    return nodes
+
+
+def run(backend, board, color, depth):
+    """
+    :return: (leaf count, nodes per second)
+    """
+    position = backend.position(board)
+    start_time = time.time()
+    nodes = perft(backend, position, color, depth)
+    elapsed = time.time() - start_time
+    return nodes, nodes / elapsed if elapsed > 0 else float('inf')
+
+
+def run_suite(backends, depth):
+    """
+    Runs the start position to the depth and the fixed positions to their reference depth
+    :return: True if all counts match the references
+    """
+    correct = True
+    tests = [('start', GameBoard().board, 0, START_COUNTS)] + FIXED_POSITIONS
+    for name, board, color, counts in tests:
+        test_depth = min(depth, len(counts))
+        expected = counts[test_depth - 1]
+        for backend_class in backends:
+            nodes, speed = run(backend_class(), board, color, test_depth)
+            status = 'ok' if nodes == expected else 'WRONG (expected %d)' % expected
+            correct = correct and nodes == expected
+            print('%-8s depth %d %-14s %10d nodes %12.0f nodes/s  %s' % (
+                name, test_depth, backend_class.name, nodes, speed, status))
+    return correct
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "d:b:")
+    options = dict(choices)
+    selected = BACKENDS
+    if '-b' in options:
+        names = options['-b'].split(',')
+        selected = [backend for backend in BACKENDS if backend.name in names]
+    if not run_suite(selected, int(options.get('-d', 6))):
+        sys.exit(1)
@@ -1,16 +1,124 @@
-# board size 8x8
+# board size 8x8, 6x6 up to 12x12 are supported too
 # 2 rounds
 # 1 second per move
 # single thread only
-from copy import deepcopy
+import os
+import time
+from search_stats import SearchStats, profile, unprofiled_state, restore_state
+from bitboard import GEOMETRY, geometry, iter_squares, popcount
+from transposition import Zobrist, TranspositionTable, EXACT, LOWER, UPPER
+from move_ordering import HeuristicOrdering
+from endgame import EndgameSolver, SolverTimeout
+from pattern_eval import PatternEvaluator, WEIGHTS_FILE
+from opening_book import OpeningBook, BOOK_FILE
+from symmetry import distinct_moves
 
-# Values for endgame boards are big constants.
-MAX_SCORE = 1176  # biggest score achievable
-MIN_SCORE = -MAX_SCORE
+# Seconds one move may take - the game allows 1 second, the rest is left for the game loop
+TIME_LIMIT = 0.8
+MAX_DEPTH = 140  # at most 140 empty fields (12x12), deeper search is never needed
+
+# With this many empty fields the exact endgame solver takes over - at 12 it fits its share of
+# the move time (a third of a second at most on 8x8), from 14 on it mostly times out and the search starts late
+ENDGAME_EMPTIES = 12
+ENDGAME_SHARE = 0.6  # part of the time limit for the solver, the search gets the rest if it fails
+
+# Search algorithms: plain alpha beta or principal variation search (null windows for the later moves)
+SEARCHES = ('alpha_beta', 'pvs')
+# Half width of the root window around the score of the previous iteration, None searches with the full window
+ASPIRATION_WINDOW = None
+
+# Transposition table entries kept between the moves
+TT_SIZE = 200000
+ZOBRIST = Zobrist(12 * 12)  # keys for the fields of the biggest board
+
+# evaluator and book argument that loads the fitted weights or the book file, None goes without
+DEFAULT = object()
+
+# board mask represents the strategic value for each field
+BOARD_MASK = [[120, -20, 20, 5, 5, 20, -20, 120],
+              [-20, -40, -5, -5, -5, -5, -40, -20],
+              [20, -5, 15, 3, 3, 15, -5, 20],
+              [5, -5, 3, 3, 3, 3, -5, 5],
+              [5, -5, 3, 3, 3, 3, -5, 5],
+              [20, -5, 15, 3, 3, 15, -5, 20],
+              [-20, -40, -5, -5, -5, -5, -40, -20],
+              [120, -20, 20, 5, 5, 20, -20, 120]
+              ]
+
+
+
+def board_mask(size):
+    """
+    Strategic value of each field of the board size. Other sizes than 8 value every field like the
+    8x8 field with the same distances to the edges - fields deeper inside than 3 like the center.
+    """
+    if size == 8:
+        return BOARD_MASK
+    board_geometry = geometry(size)
+    mask = []
+    for r in range(size):
+        row = []
+        for c in range(size):
+            dr, dc = board_geometry.edge_distances(board_geometry.square(r, c))
+            row.append(BOARD_MASK[min(dr, 3)][min(dc, 3)])
+        mask.append(row)
+    return mask
+
+
+def value_masks(board_mask, board_geometry=GEOMETRY):
+    """ (value, bitboard of the fields with that value) for every value of the board mask """
+    masks = {}
+    for r, row in enumerate(board_mask):
+        for c, value in enumerate(row):
+            masks[value] = masks.get(value, 0) | (1 << board_geometry.square(r, c))
+    return sorted(masks.items())
+
+
+class BoardTables:
+    """Evaluation tables of one board size"""
+
+    def __init__(self, size):
+        self.geometry = geometry(size)
+        self.mask = board_mask(size)
+        # the board mask evaluated with one popcount per value and color
+        self.value_masks = value_masks(self.mask, self.geometry)
+        # the board mask by field index, for the score updates of make_move
+        self.square_values = [value for row in self.mask for value in row]
+        # no evaluation reaches the sum of all values - a won game scores it
+        self.max_score = sum(abs(value) for value in self.square_values)
+
+
+_board_tables = {}
+
+
+def board_tables(size):
+    """ Shared BoardTables instance for the board size """
+    tables = _board_tables.get(size)
+    if tables is None:
+        tables = _board_tables[size] = BoardTables(size)
+    return tables
+
+
+def default_evaluator():
+    """ Pattern evaluator with the weights fitted by fit_weights.py, None (board mask) if there are none """
+    if os.path.exists(WEIGHTS_FILE):
+        return PatternEvaluator.from_file(WEIGHTS_FILE)
+    return None
+
+
+def default_book():
+    """ Opening book built by opening_book.py, None if there is none """
+    if os.path.exists(BOOK_FILE):
+        return OpeningBook(BOOK_FILE)
+    return None
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time for the move is over"""
 
 
 class Move:
-    """Stores the move coordinates with the points gained by playing it"""
+    """Stores the move field index (row * size + column) with the points gained by playing it"""
 
     def __init__(self, move, points):
         self.move = move
@@ -18,74 +126,309 @@ class Move:
 
 
 class MyPlayer:
-    """ Predict the game 4 moves ahead """
+    """ Predict the game as many moves ahead as the time limit allows """
 
-    def __init__(self, my_color, opponent_color):
+    def __init__(self, my_color, opponent_color, tt_size=TT_SIZE, tt_policy='depth', tt_eviction='fifo',
+                 time_limit=TIME_LIMIT, ordering=None, endgame_empties=ENDGAME_EMPTIES, evaluator=DEFAULT, book=DEFAULT, search='alpha_beta',
+                 aspiration_window=ASPIRATION_WINDOW, profile_search=False):
+        if search not in SEARCHES:
+            raise ValueError('Unknown search: %s' % search)
         self.name = 'skalaja7'  # username student id
         self.my_color = my_color
         self.opponent_color = opponent_color
         self.space = -1
         # for debugging and further implementation
         self.valid_moves = []
+        self.time_limit = time_limit
+        self.deadline = float('inf')
+        self.depth_reached = 0
+        # board mask score of color 0 minus color 1, kept up to date by make_move and unmake_move
+        self.position_score = 0
+        self.score_stack = []
+        # the score is only kept while the board mask evaluates - evaluation() decides
+        self.track_score = True
+        # statistics of the last move, profile_search adds timing of the search parts
+        self.stats = SearchStats()
+        if profile_search:
+            profile(self)
+        # kept between the moves - positions searched last turn are reused
+        self.zobrist = ZOBRIST
+        self.table = TranspositionTable(tt_size, tt_policy, tt_eviction)
+        if ordering is None:
+            ordering = HeuristicOrdering(BOARD_MASK)
+        self.ordering = ordering
+        self.endgame_empties = endgame_empties
+        self.pvs = search == 'pvs'
+        self.aspiration_window = aspiration_window
+        # object with evaluate(stones, symbol) - the fitted pattern weights by default,
+        # the board mask when there are none or it is None
+        if evaluator is DEFAULT:
+            evaluator = default_evaluator()
+        self.evaluator = evaluator
+        # opening book moves are played without a search - None always searches
+        if book is DEFAULT:
+            book = default_book()
+        self.book = book
+        # tables of the board size, switched by the first move on another size
+        self.set_board_size(8)
+
+    def __getstate__(self):
+        # the timed methods of a profiled player are closures - they are made again on unpickling
+        return unprofiled_state(self)
+
+    def __setstate__(self, state):
+        restore_state(self, state)
+
+    def set_board_size(self, size):
+        """ Switches the search to the tables of the board size - the transposition table starts over """
+        tables = board_tables(size)
+        self.size = size
+        self.geometry = tables.geometry
+        self.squares = tables.geometry.squares
+        self.value_masks = tables.value_masks
+        self.square_values = tables.square_values
+        self.max_score = tables.max_score
+        self.min_score = -tables.max_score
+        # move generation specialized for the size
+        self.legal_moves = tables.geometry.legal_moves
+        self.flips = tables.geometry.flips
+        self.ordering.set_board(tables.mask)
+        self.table.clear()
+        self.solver = EndgameSolver(tables.geometry)
 
     def move(self, board):
-        self.valid_moves = self.get_valid_moves(board, self.my_color)
+        self.stats.reset()
+        start_time = time.time()
+        probes = self.table.probes
+        hits = self.table.hits
+        move = self.find_move(board)
+        stats = self.stats
+        stats.times['total'] = time.time() - start_time
+        stats.depth = self.depth_reached
+        stats.table_probes = self.table.probes - probes
+        stats.table_hits = self.table.hits - hits
+        stats.log(self.name)
+        return move
+
+    def find_move(self, board):
+        """ Best move found within the time limit, None if there is no valid move """
+        # the search works on bitboards indexed by color - a search stopped by the timeout leaves them unfinished
+        if len(board) != self.size:
+            self.set_board_size(len(board))
+        stones = list(self.geometry.from_list(board, 0, self.space))
+        self.valid_moves = self.get_valid_moves(stones, self.my_color)
         if not self.valid_moves:
             return None
-        move = self.alpha_beta_search(self.my_color, board, MIN_SCORE, MAX_SCORE, 4, self.eval_board)
-        return move.move
+        self.depth_reached = 0
+        if self.book is not None and self.book.size == self.size:
+            move = self.book.lookup(stones[self.my_color], stones[self.opponent_color])
+            if move is not None:
+                return self.geometry.coords(move)
+        key = self.start_search(stones, time.time() + self.time_limit)
+        empty_fields = self.squares - popcount(stones[0] | stones[1])
+        if empty_fields <= self.endgame_empties:
+            move = self.solve_endgame(stones)
+            if move is not None:
+                self.deadline = float('inf')
+                return self.geometry.coords(move)
+        best_move = self.iterative_deepening(stones, key, empty_fields)
+        self.deadline = float('inf')
+        return self.geometry.coords(best_move)
 
-    def alpha_beta_search(self, symbol, board, alpha, beta, depth, evaluate):
+    def start_search(self, stones, deadline):
+        """
+        Resets the state kept during the search of one move
+        :param stones: bitboards of the root position, my color to move
+        :param deadline: time.time() when the search must stop
+        :return: Zobrist key of the root position
+        """
+        self.deadline = deadline
+        self.table.new_search()
+        self.ordering.new_search()
+        self.position_score = self.position_value(stones)
+        self.score_stack = []
+        return self.zobrist.hash_position(stones, self.my_color)
+
+    def evaluation(self):
+        """ Evaluation function of the search - the board mask if the evaluator is made for another size """
+        self.track_score = self.evaluator is None or getattr(self.evaluator, 'size', self.size) != self.size
+        if self.track_score:
+            return self.eval_board
+        return self.evaluator.evaluate
+
+    def iterative_deepening(self, stones, key, empty_fields):
+        """ Field index of the best move of the deepest search finished before the deadline """
+        evaluate = self.evaluation()
+        best_move = self.valid_moves[0].move
+        score = None
+        for depth in range(1, MAX_DEPTH + 1):
+            try:
+                move = self.search_root(stones, depth, evaluate, key, score)
+            except SearchTimeout:
+                break
+            if move.move is not None:
+                best_move = move.move
+            score = move.points
+            self.depth_reached = depth
+            if depth >= empty_fields:
+                # the search reached the end of the game
+                break
+        return best_move
+
+    def solve_endgame(self, stones):
+        """ Perfect move found by the endgame solver, None if the solver runs out of time """
+        deadline = time.time() + self.time_limit * ENDGAME_SHARE
+        try:
+            score, square = self.solver.solve(stones[self.my_color], stones[self.opponent_color], deadline)
+        except SolverTimeout:
+            return None
+        finally:
+            self.stats.endgame_nodes = self.solver.nodes
+        return square
+
+    def search_root(self, stones, depth, evaluate, key, score=None):
+        """
+        One iteration of the iterative deepening
+        :param score: score of the previous iteration - the aspiration window is centered on it
+        :return: Move with the best move and its score
+        """
+        window = self.aspiration_window
+        if window is not None and score is not None:
+            alpha = max(score - window, self.min_score)
+            beta = min(score + window, self.max_score)
+            move = self.alpha_beta_search(self.my_color, stones, alpha, beta, depth, evaluate, key)
+            if alpha < move.points < beta:
+                return move
+            # the score is outside of the window - only a bound is known, search again with the full window
+            self.stats.research += 1
+        return self.alpha_beta_search(self.my_color, stones, self.min_score, self.max_score, depth, evaluate, key)
+
+    def search_moves(self, stones, moves, depth, evaluate, key, alpha=None):
+        """
+        Searches only the given root moves, in the given order
+        :param moves: field indexes of legal moves of my color
+        :param alpha: the moves must beat this score, None accepts any score
+        :return: Move with the best of the moves and its exact score, the score stays alpha if none beats it
+        """
+        if alpha is None:
+            alpha = self.min_score
+        best_move = Move(moves[0], alpha)
+        symbol = self.my_color
+        for move in moves:
+            flipped = self.make_move(stones, move, symbol)
+            val = -self.alpha_beta_search(self.opponent_color, stones, -self.max_score, -alpha, depth - 1, evaluate,
+                                          self.zobrist.move_key(key, move, flipped, symbol), 1).points
+            self.unmake_move(stones, move, flipped)
+            if val > alpha:
+                alpha = val
+                best_move.move = move
+                best_move.points = val
+        return best_move
+
+    def alpha_beta_search(self, symbol, stones, alpha, beta, depth, evaluate, key=None, ply=0):
         """
         Find the best legal move for player, searching to the given depth. Standard alpha beta algorithm
+        with a transposition table. In the pvs mode only the first move gets the full window, the others
+        are searched with a null window first and searched again only if they turn out better.
         :rtype: Move
         :param symbol: player color
-        :param board: playing board
+        :param stones: playing board - bitboards indexed by color
         :param alpha: Maximum gain for me
         :param beta: Max opponent gain
         :param depth: How many moves ahead I see
         :param evaluate: Function that computes the board value
+        :param key: Zobrist hash of the board with symbol to move, computed if not given
+        :param ply: How many moves from the root the board is
         :return: The considering given amount of moves
+        :raise SearchTimeout: when the deadline set by move() passes
         """
+        if time.time() > self.deadline:
+            raise SearchTimeout()
+        self.stats.nodes += 1
         # last examined board - return the board value for current symbol
         if depth == 0:
-            return Move(None, evaluate(board, symbol))
+            self.stats.leaves += 1
+            return Move(None, evaluate(stones, symbol))
 
-        def value(board, alpha, beta):
+        if key is None:
+            key = self.zobrist.hash_position(stones, symbol)
+        table_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            table_move = entry.move
+            if entry.depth >= depth:
+                # the position was already searched at least this deep
+                if entry.bound == EXACT:
+                    return Move(entry.move, entry.score)
+                if entry.bound == LOWER and entry.score >= beta:
+                    return Move(entry.move, entry.score)
+                if entry.bound == UPPER and entry.score <= alpha:
+                    return Move(entry.move, entry.score)
+
+        def value(stones, key, alpha, beta):
             # Compute the board value for the opponent of the current symbol
-            return -self.alpha_beta_search(self.find_opponent(symbol), board, -beta, -alpha, depth - 1, evaluate).points
+            return -self.alpha_beta_search(self.find_opponent(symbol), stones, -beta, -alpha, depth - 1, evaluate,
+                                           key, ply + 1).points
 
-        moves = self.get_valid_moves(board, symbol)
+        moves = self.generate_moves(stones, symbol)
         if not moves:
-            if not self.get_valid_moves(board, self.find_opponent(symbol)):
+            if not self.generate_moves(stones, self.find_opponent(symbol)):
                 # last round - return the last board score
-                return Move(None, self.final_value(symbol, board))
+                return Move(None, self.final_value(symbol, stones))
             # cannot play this round - return the board value unchanged
-            return Move(None, value(board, alpha, beta))
+            return Move(None, value(stones, key ^ self.zobrist.turn, alpha, beta))
+        if ply == 0:
+            # symmetric moves of a symmetric position lead to equal positions - one of them is enough
+            moves = distinct_moves(stones[symbol], stones[1 - symbol], moves, self.size)
+
+        self.ordering.order(moves, ply, table_move)
 
-        best_move = moves[0]
-        best_move.points = alpha
+        alpha_start = alpha
+        best_move = Move(moves[0], alpha)
+        null_window = False
         for move in moves:
             if alpha >= beta:
                 # Skip those moves, that would bring disadvantage to the opponent
                 # The opponent will not play badly on purpose - no need to evaluate those nodes
                 # Expect the best possible move from the opponent
                 break
-            val = value(self.simulate_move(board, move.move, symbol), alpha, beta)
+            flipped = self.make_move(stones, move, symbol)
+            child_key = self.zobrist.move_key(key, move, flipped, symbol)
+            if null_window:
+                # only proves that the move is not better than alpha
+                val = value(stones, child_key, alpha, alpha + 1)
+                if alpha < val < beta:
+                    self.stats.research += 1
+                    val = value(stones, child_key, alpha, beta)
+            else:
+                val = value(stones, child_key, alpha, beta)
+                null_window = self.pvs
+            self.unmake_move(stones, move, flipped)
             if val > alpha:
                 # Found new maximum - replace old maximum
                 alpha = val
-                best_move = move
+                best_move.move = move
                 best_move.points = alpha
+                if alpha >= beta:
+                    self.ordering.cutoff(move, ply, depth)
+                    self.stats.cutoff(ply)
+
+        if best_move.points <= alpha_start:
+            bound = UPPER
+        elif best_move.points >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, best_move.points, bound, best_move.move)
         return best_move
 
-    def final_value(self, symbol, board):
-        """If I win the last board return MAX_SCORE so the alpha beta uses this branch"""
-        score = self.score(board, symbol)
+    def final_value(self, symbol, stones):
+        """If I win the last board return the maximal score so the alpha beta uses this branch"""
+        score = self.score(stones, symbol)
         if score < 0:
-            return MIN_SCORE
+            return self.min_score
         elif score > 0:
-            return MAX_SCORE
+            return self.max_score
         return score
 
     @staticmethod
@@ -100,148 +443,101 @@ class MyPlayer:
         else:
             return -1
 
-    def score(self, board, symbol):
+    def score(self, stones, symbol):
         """ Counts number of stones minus opponents stones """
-        score = 0
-        for r in range(8):
-            for c in range(8):
-                if board[r][c] == symbol:
-                    score += 1
-                elif board[r][c] == self.find_opponent(symbol):
-                    score -= 1
-        return score
+        return popcount(stones[symbol]) - popcount(stones[1 - symbol])
 
-    def eval_board(self, board, symbol):
-        """ Evaluates board for the given symbol using board mask"""
-        # board mask represents the strategic value for each field
-        board_mask = [[120, -20, 20, 5, 5, 20, -20, 120],
-                      [-20, -40, -5, -5, -5, -5, -40, -20],
-                      [20, -5, 15, 3, 3, 15, -5, 20],
-                      [5, -5, 3, 3, 3, 3, -5, 5],
-                      [5, -5, 3, 3, 3, 3, -5, 5],
-                      [20, -5, 15, 3, 3, 15, -5, 20],
-                      [-20, -40, -5, -5, -5, -5, -40, -20],
-                      [120, -20, 20, 5, 5, 20, -20, 120]
-                      ]
+    def eval_board(self, stones, symbol):
+        """
+        Evaluates board for the given symbol using board mask
+        The score is the one kept by make_move - stones must be the board the search plays on.
+        """
+        if symbol == 0:
+            return self.position_score
+        return -self.position_score
+
+    def position_value(self, stones):
+        """ Board mask score of color 0 minus color 1 computed from scratch """
         score = 0
-        for r in range(8):
-            for c in range(8):
-                if board[r][c] == symbol:
-                    score += board_mask[r][c]
-                elif board[r][c] == self.find_opponent(symbol):
-                    score -= board_mask[r][c]
+        for value, mask in self.value_masks:
+            score += value * (popcount(stones[0] & mask) - popcount(stones[1] & mask))
         return score
 
-    def get_valid_moves(self, board, symbol):
+    def move_value(self, move, flipped):
+        """ Change of the score of the moving color - the placed stone once, flipped stones from both sides """
+        square_values = self.square_values
+        score = square_values[move]
+        flipped_score = 0
+        while flipped:
+            low = flipped & -flipped
+            flipped_score += square_values[low.bit_length() - 1]
+            flipped ^= low
+        return score + 2 * flipped_score
+
+    def get_valid_moves(self, stones, symbol):
         """
-        Check all fields, and find out how many points I get if I play there
-        :param board: The board that the moves should be found on
+        Find all valid moves and how many stones each of them flips
+        :param stones: The board that the moves should be found on
         :param symbol: Examined symbol (player color)
-        :return: Collection ofall valid moves for given symbol on a current board
+        :return: Collection of all valid moves for given symbol, None if there is none
         """
-        valid_moves = []
-        for r in range(8):
-            for c in range(8):
-                # exam free spaces only
-                if board[r][c] == self.space:
-                    gain = self.check_move(board, r, c, symbol)
-                    if gain > 0:
-                        valid_moves.append(Move((r, c), gain))
+        own = stones[symbol]
+        opp = stones[1 - symbol]
+        flips = self.flips
+        valid_moves = [Move(square, popcount(flips(square, own, opp)))
+                       for square in iter_squares(self.legal_moves(own, opp))]
         if not valid_moves:
             return None
         else:
             return valid_moves
 
-    def check_move(self, board, r, c, symbol):
-        """
-        Inspects if the field is a valid move for a given symbol
-        Check all directions for other symbol and count the possible points
-        :param board:
-        :param r: row
-        :param c: column
-        :param symbol: examined symbol
-        :return: minimum of points, that the move provides, returns 0 if the move is not valid
-        """
-        points = 0
-        # h and v are directional vectors
-        for h in [-1, 0, 1]:
-            for v in [-1, 0, 1]:
-                if v != 0 or h != 0:
-                    if is_field_legit(r + h, c + v):
-                        examined = board[r + h][c + v]
-                        if examined != self.space and examined != symbol:
-                            points += self.count_points(board, r + h, c + v, h, v)
-                        # If I can flip some stones - the move is valid
-                        if points > 0:
-                            return points
-        return points
-
-    def count_points(self, board, r, c, horizontal_direction, vertical_direction):
-        """
-        Count how many stones are in a given direction
-        :param board:
-        :param r:
-        :param c:
-        :param horizontal_direction:
-        :param vertical_direction:
-        :return: 0 if the move is not valid - space found between stones
-        """
-        symbol = board[r][c]
-        count = 1
-        # k is a scalar multipliers for directional vectors
-        for k in range(1, 9):
-            if is_field_legit(r + k * horizontal_direction, c + k * vertical_direction):
-                if board[r + k * horizontal_direction][c + k * vertical_direction] == self.space:
-                    return 0
-                elif board[r + k * horizontal_direction][c + k * vertical_direction] == symbol:
-                    count += 1
-                else:
-                    return count
-            else:
-                return 0
-        return count
+    def generate_moves(self, stones, symbol):
+        """ Field indexes of all valid moves for the symbol """
+        return list(iter_squares(self.legal_moves(stones[symbol], stones[1 - symbol])))
 
     def simulate_move(self, board, move, symbol):
-        """ Performs a move on the board and returns a new (transformed) board """
+        """ Performs a move on the nested list board and returns a new (transformed) board """
         if move == None:
             return board
-        r = move[0]
-        c = move[1]
-        board_copy = deepcopy(board)
-        board_copy[r][c] = symbol
-
-        for v in [-1, 0, 1]:
-            for h in [-1, 0, 1]:
-                stones = []
-                if v == 0 == h:
-                    continue
-                row = r
-                col = c
-                row += v
-                col += h
-                while is_field_legit(row, col):
-                    # if it is other symbol
-                    if board_copy[row][col] != symbol and board_copy[row][col] != self.space:
-                        stones.append((row, col))
-                    # if space found - oon t flip this line
-                    elif board_copy[row][col] == self.space:
-                        break
-                    # same symbol found flip all stones
-                    elif board_copy[row][col] == symbol:
-                        for a, b in stones:
-                            board_copy[a][b] = symbol
-                        break
-                    row += v
-                    col += h
-        return board_copy
-
-
-def is_field_legit(r, c):
-    """
-    checks if the field is located within a board
-    :rtype: bool
-    """
-    return 0 <= r < 8 and 0 <= c < 8
+        if len(board) != self.size:
+            self.set_board_size(len(board))
+        stones = list(self.geometry.from_list(board, 0, self.space))
+        self.make_move(stones, self.geometry.square(move[0], move[1]), symbol)
+        return self.geometry.to_list(stones[0], stones[1], 0, 1, self.space)
+
+    def make_move(self, stones, move, symbol):
+        """
+        Performs a move in place and updates the board mask score, if eval_board is the evaluation
+        :param stones: bitboards indexed by color, changed by the move
+        :param move: field index of the placed stone, None for a pass
+        :param symbol: color of the placed stone
+        :return: bitboard of flipped stones - the undo record for unmake_move
+        """
+        if move is None:
+            return 0
+        own = stones[symbol]
+        opp = stones[1 - symbol]
+        flipped = self.flips(move, own, opp)
+        stones[symbol] = own | flipped | (1 << move)
+        stones[1 - symbol] = opp ^ flipped
+        if self.track_score:
+            self.score_stack.append(self.position_score)
+            if symbol == 0:
+                self.position_score += self.move_value(move, flipped)
+            else:
+                self.position_score -= self.move_value(move, flipped)
+        return flipped
+
+    def unmake_move(self, stones, move, flipped):
+        """ Takes back the move played by make_move, flipped is its undo record """
+        if move is None:
+            return
+        bit = 1 << move
+        symbol = 0 if stones[0] & bit else 1
+        stones[symbol] ^= flipped | bit
+        stones[1 - symbol] |= flipped
+        if self.track_score:
+            self.position_score = self.score_stack.pop()
 
 
 # Tests
@@ -268,7 +564,7 @@ if __name__ == "__main__":
         print(row)
 
     for item in player.valid_moves:
-        print(item.move, " - ", item.points)
+        print(GEOMETRY.coords(item.move), " - ", item.points)
 
     print("returned: ", pmove)
     playBoard = player.simulate_move(sample_board, pmove, player.my_color)
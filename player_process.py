@@ -0,0 +1,140 @@
+"""
+Runs a player in its own long-lived process.
+
+The process is started once and then receives boards and sends back moves
+through a pipe, so a move costs only the pipe round trip instead of starting
+a new process. Starting waits until the process has unpickled the player, so
+the imports and the loading of weights or books never count as move time. A
+move that is not returned within the time limit kills the process; a fresh
+one is started from the original player before the next move, if any.
+"""
+import multiprocessing
+import time
+
+# Seconds a player has for one move
+MOVE_TIME_LIMIT = 1.0
+
+# Seconds a player process has to start, before any move clock runs
+START_TIMEOUT = 30.0
+
+# first message of the player process
+READY = 'ready'
+
+
+class MoveTimeout(Exception):
+    """The player did not return the move in time"""
+
+
+class PlayerCrash(Exception):
+    """The player raised an exception while computing the move, or its process ended or did not start"""
+
+
+def serve(connection, player):
+    """
+    Main loop of the player process - answers boards with moves until None is received
+    :param connection: child end of the pipe
+    :param player: the player instance, it keeps its state between the moves
+    """
+    # the player is unpickled by now - the parent may start the move clock
+    connection.send(READY)
+    while True:
+        board = connection.recv()
+        if board is None:
+            break
+        try:
+            move = player.move(board)
+        except Exception as error:
+            connection.send((None, repr(error)))
+        else:
+            connection.send((move, None))
+    connection.close()
+
+
+class PlayerProcess(object):
+    """
+    Parent side of the player process. Use it as the player:
+
+    worker = PlayerProcess(MyPlayer(0, 1))
+    move, move_time_ms = worker.move(board)
+    worker.close()
+    """
+
+    def __init__(self, player, time_limit=MOVE_TIME_LIMIT):
+        """
+        :param player: player instance moved to the process, a copy of it is used after every restart
+        :param time_limit: seconds for one move, measured from sending the board to receiving the move
+        """
+        self.player = player
+        self.name = player.name
+        self.time_limit = time_limit
+        self.process = None
+        self.connection = None
+        self.start()
+
+    def start(self, timeout=START_TIMEOUT):
+        """
+        Starts the process and waits until it is ready for the first move
+        :raise PlayerCrash: the process ended or was not ready within the timeout
+        """
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, args=(child_connection, self.player))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+        try:
+            ready = self.connection.poll(timeout) and self.connection.recv() == READY
+        except EOFError:
+            ready = False
+        if not ready:
+            self.kill()
+            raise PlayerCrash('Player %s process did not start in %.1f s' % (self.name, timeout))
+
+    def kill(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+
+    def move(self, board):
+        """
+        Asks the player process for a move
+        :param board: board as a list of rows
+        :return: (move, time of the move in ms)
+        :raise MoveTimeout: the move took too long - the process is killed, the next move starts a new one
+        :raise PlayerCrash: the player raised an exception or its process ended
+        """
+        if self.process is None:
+            # killed by the last move - the start is not part of the move time
+            self.start()
+        start_time = time.time()
+        try:
+            self.connection.send(board)
+        except (IOError, OSError):
+            self.kill()
+            raise PlayerCrash('Player %s process ended' % self.name)
+        if not self.connection.poll(self.time_limit):
+            self.kill()
+            raise MoveTimeout('Player %s did not move in %.3f s' % (self.name, self.time_limit))
+        try:
+            move, error = self.connection.recv()
+        except EOFError:
+            # the process died
+            self.kill()
+            raise PlayerCrash('Player %s process ended' % self.name)
+        move_time = (time.time() - start_time) * 1000
+        if error is not None:
+            raise PlayerCrash('Player %s failed: %s' % (self.name, error))
+        return move, move_time
+
+    def close(self):
+        """
+        Stops the process, it can not be used afterwards.
+        """
+        if self.process is not None:
+            try:
+                self.connection.send(None)
+            except (IOError, OSError):
+                pass
+            self.process.join(self.time_limit)
+            self.kill()
@@ -1,5 +1,7 @@
 from random import randint
 
+import bitboard
+
 
 class MyPlayer(object):
     '''
@@ -15,11 +17,9 @@ class MyPlayer(object):
 
     def move(self, board):
         boardSize = len(board)
-        possible = []
-        for x in range(boardSize):
-            for y in range(boardSize):
-                if (board[x][y] == -1) and self.is_correct_move([x, y], board, boardSize):
-                    possible.append((x, y))
+        geometry = bitboard.geometry(boardSize)
+        own, opp = geometry.from_list(board, self.my_color)
+        possible = [geometry.coords(square) for square in bitboard.iter_squares(geometry.legal_moves(own, opp))]
 
         possible_moves = len(possible) - 1
         if possible_moves < 0:
@@ -29,25 +29,6 @@ class MyPlayer(object):
         return possible[my_move]
 
     def is_correct_move(self, move, board, boardSize):
-        dx = [-1, -1, -1, 0, 1, 1, 1, 0]
-        dy = [-1, 0, 1, 1, 1, 0, -1, -1]
-        for i in range(len(dx)):
-            if self.confirm_direction(move, dx[i], dy[i], board, boardSize):
-                return True
-        return False
-
-    def confirm_direction(self, move, dx, dy, board, boardSize):
-        posx = move[0] + dx
-        posy = move[1] + dy
-        if (posx >= 0) and (posx < boardSize) and (posy >= 0) and (posy < boardSize):
-            if board[posx][posy] == self.opponentColor:
-                while (posx >= 0) and (posx <= (boardSize - 1)) and (posy >= 0) and (posy <= (boardSize - 1)):
-                    posx += dx
-                    posy += dy
-                    if (posx >= 0) and (posx < boardSize) and (posy >= 0) and (posy < boardSize):
-                        if board[posx][posy] == -1:
-                            return False
-                        if board[posx][posy] == self.my_color:
-                            return True
-
-        return False
+        geometry = bitboard.geometry(boardSize)
+        own, opp = geometry.from_list(board, self.my_color)
+        return geometry.flips(geometry.square(move[0], move[1]), own, opp) != 0
@@ -1,8 +1,8 @@
 import random_player
 from game_board import GameBoard
 from reversi_view import ReversiView
+from player_process import PlayerProcess, MoveTimeout, PlayerCrash, MOVE_TIME_LIMIT
 import time
-import multiprocessing 
 import copy, getopt, sys
 
 class ReversiCreator(object):
@@ -22,6 +22,9 @@ class ReversiCreator(object):
         self.player2 = player_class(self.player2_color,self.player1_color)
         self.board = GameBoard()
         self.sleep_time_ms = 200;
+        self.move_time_limit = MOVE_TIME_LIMIT
+        # long-lived process of each player, keyed by color
+        self.player_processes = {}
         self.gui = ReversiView()
         self.gui.set_game(self)
         self.gui.set_board(self.board)
@@ -36,6 +39,10 @@ class ReversiCreator(object):
         '''
         print('clear_game')
         self.max_times_ms = [0 , 0]
+        # players start the new game in fresh processes
+        for player_process in self.player_processes.values():
+            player_process.close()
+        self.player_processes = {}
         self.board.init_board()
         self.board.clear()
         stones = self.board.get_score()
@@ -50,16 +57,17 @@ class ReversiCreator(object):
         '''
         self.paused = to_pause
 
-    def get_player_move(self, q):
+    def get_player_process(self):
         '''
-        Returns current player move to Queue, meant for threaded call.  
-        :param q: Queue for returning the move with spent time.
+        Returns the process of the current player, starts a new one when the player was changed in the gui.
         '''
-        start_time = time.time()
-        move = self.current_player.move(self.board.get_board_copy())
-        endTime = time.time()
-        moveTime = (endTime - start_time) * 1000
-        q.put({'time':moveTime, 'move':move})
+        player_process = self.player_processes.get(self.current_player_color)
+        if player_process is None or player_process.player is not self.current_player:
+            if player_process is not None:
+                player_process.close()
+            player_process = PlayerProcess(self.current_player, self.move_time_limit)
+            self.player_processes[self.current_player_color] = player_process
+        return player_process
 
         
 
@@ -82,16 +90,19 @@ class ReversiCreator(object):
                 self.gui.inform(inform_str, 'green')
                 break
             
-            q = multiprocessing.Queue()
-            p = multiprocessing.Process(target=self.get_player_move, args=(q,))
-            p.start()
-            # Wait for 1 second
-            p.join(1)
-            if p.is_alive():
+            try:
+                move, move_time = self.get_player_process().move(self.board.get_board_copy())
+            except MoveTimeout:
                 print("running too long - killing it")
-                p.terminate()
-                p.join()
                 player_move_overtime = self.current_player_color
+            except PlayerCrash as error:
+                # the player lost like by a wrong move
+                print(error)
+                inform_str = 'Player %d crashed - loses' % (self.current_player_color)
+                self.gui.inform(inform_str, 'red')
+                self.gui.wrong_move = True
+                wrong_move = True
+                break
                 
             
             if player_move_overtime != -1:
@@ -99,9 +110,6 @@ class ReversiCreator(object):
                 self.gui.inform(inform_str, 'red')
                 break
             
-            returned_move = q.get()
-            move_time = returned_move['time']
-            move = returned_move['move']
             self.max_times_ms[self.current_player_color] = max(self.max_times_ms[self.current_player_color], move_time)
             print('Player %d wants move [%d,%d]. Move takes %.3f ms.' % (self.current_player_color, move[0], move[1], move_time))
             next_player_id = -1
@@ -325,12 +325,13 @@ class ReversiView:
         Show the state of the board in gui.
         '''
         # self.board.print_board()
+        board = self.board.board
         for y in range(self.board.board_size):
             for x in range(self.board.board_size):
-                if self.board.board[y][x] == -1:
+                if board[y][x] == -1:
                     self.clear_stone(x, y)
                 else:
-                    self.draw_stone(x, y, self.board.board[y][x])
+                    self.draw_stone(x, y, board[y][x])
         self.root.update()
         
     def place_stone_click_handler(self, event):
@@ -0,0 +1,127 @@
+"""
+Statistics of the search players, collected for every move() call.
+
+Counters are always on. Timing of move generation, evaluation and board
+updates costs a clock call per function call, so it is switched on only
+by profile(player).
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SearchStats:
+    """Counters of one move() call"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = []  # beta cutoffs for every ply
+        self.table_probes = 0
+        self.table_hits = 0
+        self.depth = 0
+        self.endgame_nodes = 0
+        self.research = 0  # null window or aspiration window searches repeated with a wider window
+        # seconds - the parts are measured only for profiled players
+        self.times = {'total': 0.0, 'move_generation': 0.0, 'evaluation': 0.0, 'make_move': 0.0}
+
+    def cutoff(self, ply):
+        while len(self.cutoffs) <= ply:
+            self.cutoffs.append(0)
+        self.cutoffs[ply] += 1
+
+    @property
+    def table_hit_rate(self):
+        """ Part of transposition table probes that found the position, None without a table """
+        if not self.table_probes:
+            return None
+        return self.table_hits / float(self.table_probes)
+
+    def as_dict(self):
+        return {
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'cutoffs': list(self.cutoffs),
+            'table_probes': self.table_probes,
+            'table_hits': self.table_hits,
+            'table_hit_rate': self.table_hit_rate,
+            'depth': self.depth,
+            'endgame_nodes': self.endgame_nodes,
+            'research': self.research,
+            'times': dict(self.times),
+        }
+
+    def __str__(self):
+        hit_rate = self.table_hit_rate
+        return 'depth %d, %d nodes, %d leaves, %d endgame nodes, cutoffs by ply %s, table hits %s, %.1f ms' % (
+            self.depth, self.nodes, self.leaves, self.endgame_nodes, self.cutoffs,
+            '-' if hit_rate is None else '%.1f %%' % (100 * hit_rate), 1000 * self.times['total'])
+
+    def log(self, name):
+        logger.info('%s: %s', name, self)
+
+
+# player methods timed by profile and the part of the search they count for
+PARTS = [('get_valid_moves', 'move_generation'), ('generate_moves', 'move_generation'),
+         ('eval_board', 'evaluation'), ('score', 'evaluation'),
+         ('make_move', 'make_move'), ('unmake_move', 'make_move')]
+
+
+def profile(player):
+    """
+    Measures the time spent in move generation, evaluation and board updates of the player.
+    The player methods are replaced by timed versions on the instance only, and so is
+    the evaluation function returned by player.evaluation().
+    The timed versions cannot be pickled - the players pickle unprofiled_state and call restore_state.
+    """
+    stats = player.stats
+    player.profiled = True
+    for method, part in PARTS:
+        if hasattr(player, method):
+            # stats.reset() replaces the dict - look it up at call time
+            setattr(player, method, _timed(getattr(player, method), stats, part))
+    if hasattr(player, 'evaluation'):
+        # the search evaluates by the function evaluation() returns, e.g. a pattern evaluator
+        player.evaluation = _timed_result(player.evaluation, stats, 'evaluation')
+
+
+def unprofiled_state(player):
+    """ Attributes of the player without the timed methods of profile """
+    state = player.__dict__.copy()
+    if state.get('profiled'):
+        for method, part in PARTS:
+            state.pop(method, None)
+        state.pop('evaluation', None)
+    return state
+
+
+def restore_state(player, state):
+    """ Sets the attributes of unprofiled_state, a profiled player is profiled again """
+    player.__dict__.update(state)
+    if state.get('profiled'):
+        profile(player)
+
+
+def _timed(function, stats, part):
+    def timed(*args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            stats.times[part] += time.perf_counter() - start
+    timed.part = part
+    return timed
+
+
+def _timed_result(function, stats, part):
+    """ Times the function returned by the function, unless it is timed already """
+    def timed_result(*args):
+        result = function(*args)
+        if getattr(result, 'part', None) == part:
+            return result
+        return _timed(result, stats, part)
+    return timed_result
@@ -0,0 +1,175 @@
+"""
+Self-play positions with the final result for fitting the evaluation weights.
+
+Games are played by HeadlessReversiCreator on all CPU cores. Every position
+of a finished game is stored from the view of the color to move, labeled
+with the final disc difference from the same view. The positions stream
+into an append-only binary file that numpy can memory map:
+
+    header   4 byte magic, 1 byte version
+    records  own stones (uint64), opponent stones (uint64), final disc difference (int8),
+             17 bytes little endian per position
+
+>> python selfplay.py -n 1000 -o positions.bin
+>> python selfplay.py -n 200 -t 0.05 -x 8 -p player,dummier -o positions.bin
+
+Options:
+    -n N         number of games (default 100)
+    -o FILE      positions file, appended to (default positions.bin)
+    -p A,B       player modules, every game picks a random pair (default player)
+    -t SECONDS   time limit of the search players for one move (default 0.05)
+    -x N         the first N plies are random moves, so the games differ (default 6)
+    -j N         number of worker processes (default all cores)
+    -r FILE      also append the record of every game to the file, e.g. for opening_book.py -
+                 a binary archive for names ending with .rga, JSON lines otherwise
+"""
+import getopt
+import os
+import random
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import GEOMETRY, legal_moves, flips, iter_squares, popcount
+from game_record import prepare_record_file
+from headless_reversi_creator import HeadlessReversiCreator, SILENT
+
+MAGIC = b'RVPS'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+RECORD = struct.Struct('<QQb')
+
+P1_COLOR = 0
+P2_COLOR = 1
+
+
+class RandomOpening:
+    """Plays random moves for the first plies of the game, then lets the wrapped player move"""
+
+    def __init__(self, player, plies, seed):
+        self.player = player
+        self.name = player.name
+        self.plies = plies
+        self.random = random.Random(seed)
+
+    def move(self, board):
+        own, opp = GEOMETRY.from_list(board, self.player.my_color)
+        if popcount(own | opp) - 4 < self.plies:
+            moves = list(iter_squares(legal_moves(own, opp)))
+            if moves:
+                return GEOMETRY.coords(self.random.choice(moves))
+        return self.player.move(board)
+
+
+def game_positions(moves, final_stones):
+    """
+    Replays the game record
+    :param moves: [color, row, column] of every move
+    :param final_stones: stones of color 0 and color 1 at the end of the game
+    :return: list of (own stones, opponent stones, final disc difference) before every move
+    """
+    stones = list(GEOMETRY.start_position())
+    positions = []
+    for color, r, c in moves:
+        own = stones[color]
+        opp = stones[1 - color]
+        difference = final_stones[color] - final_stones[1 - color]
+        positions.append((own, opp, difference))
+        square = GEOMETRY.square(r, c)
+        flipped = flips(square, own, opp)
+        stones[color] = own | flipped | (1 << square)
+        stones[1 - color] = opp ^ flipped
+    return positions
+
+
+def play_selfplay_game(job):
+    """
+    Plays one silent game in a worker process
+    :param job: (first player module name, second player module name, time limit, random plies, seed,
+        record path or None)
+    :return: packed records of the positions, empty if a player failed
+    """
+    first, second, time_limit, random_plies, seed, record_path = job
+    players = []
+    for module, color, opponent in ((first, P1_COLOR, P2_COLOR), (second, P2_COLOR, P1_COLOR)):
+        player = __import__(module).MyPlayer(color, opponent)
+        if hasattr(player, 'time_limit'):
+            player.time_limit = time_limit
+        players.append(RandomOpening(player, random_plies, seed * 2 + color))
+    # the players keep to their own time limit - no need for the player processes
+    game = HeadlessReversiCreator(players[0], P1_COLOR, players[1], P2_COLOR, 8, SILENT, record_path, time_limit=None)
+    try:
+        game.play_game()
+    except Exception:
+        return b''
+    if game.wrong_move_color is not None:
+        return b''
+    positions = game_positions(game.moves, game.board.get_score())
+    return b''.join(RECORD.pack(*position) for position in positions)
+
+
+def open_positions(path):
+    """ Opens the positions file for appending, writes the header of a new file """
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    positions_file = open(path, 'ab')
+    if new_file:
+        positions_file.write(HEADER.pack(MAGIC, VERSION))
+    return positions_file
+
+
+def generate(path, games, players=('player',), time_limit=0.05, random_plies=6, processes=None, seed=None,
+             progress=None, record_path=None):
+    """
+    Plays the games on a process pool and appends their positions to the file as they finish
+    :param record_path: file the record of every game is appended to, an archive for names ending with .rga
+    :param progress: called with (finished games, all games, positions written) after every game
+    :return: number of positions written
+    """
+    rng = random.Random(seed)
+    jobs = [(rng.choice(players), rng.choice(players), time_limit, random_plies, rng.getrandbits(32), record_path)
+            for _ in range(games)]
+    prepare_record_file(record_path)
+    written = 0
+    with open_positions(path) as positions_file:
+        with ProcessPoolExecutor(processes) as pool:
+            # map hands out the results in order and drops them once written - memory stays flat
+            for done, records in enumerate(pool.map(play_selfplay_game, jobs, chunksize=4), 1):
+                positions_file.write(records)
+                positions_file.flush()
+                written += len(records) // RECORD.size
+                if progress is not None:
+                    progress(done, games, written)
+    return written
+
+
+def load_positions(path):
+    """
+    Memory maps the positions file
+    :return: numpy record array with fields own, opp and score
+    :raise ValueError: when the file is not a positions file
+    """
+    import numpy as np
+    with open(path, 'rb') as positions_file:
+        header = positions_file.read(HEADER.size)
+    if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION):
+        raise ValueError('%s is not a positions file of version %d' % (path, VERSION))
+    dtype = np.dtype([('own', '<u8'), ('opp', '<u8'), ('score', 'i1')])
+    count = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(count,))
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "n:o:p:t:x:j:r:")
+    options = dict(choices)
+    processes = int(options['-j']) if '-j' in options else None
+
+    def report(done, total, written):
+        sys.stdout.write('\r%d/%d games, %d positions' % (done, total, written))
+        sys.stdout.flush()
+
+    generate(options.get('-o', 'positions.bin'), int(options.get('-n', 100)), options.get('-p', 'player').split(','),
+             float(options.get('-t', 0.05)), int(options.get('-x', 6)), processes, progress=report,
+             record_path=options.get('-r'))
+    print('')
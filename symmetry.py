@@ -0,0 +1,191 @@
+"""
+The 8 symmetries of the square board on bitboards - rotations and mirror images.
+
+Symmetry s mirrors the columns if bit 0 is set, then flips the rows if bit 1
+is set, then transposes if bit 2 is set. A symmetry moves every field to
+another field, so the image of a bitboard is the union of the images of its
+bytes. BoardSymmetry keeps for every byte of the bitboard and every byte
+value the images under all 8 symmetries side by side in one integer, one
+lane per symmetry: a bitboard is turned in all 8 ways by one table lookup
+per byte.
+
+The canonical form of a position is the smallest of its 8 versions, so all
+symmetric positions share it. canonical and canonical_key are cached - the
+same positions come again and again at the root of a search and in the
+openings of recorded games.
+"""
+import functools
+
+from transposition import Zobrist
+
+SYMMETRIES = 8
+
+# canonical keys are part of the opening book file - the seed must never change
+KEY_SEED = 1975
+
+# positions kept by the caches of canonical and canonical_key
+CACHE_SIZE = 4096
+
+
+class BoardSymmetry:
+    """Symmetry tables for one board size"""
+
+    def __init__(self, size):
+        self.size = size
+        self.squares = size * size
+        self.full = (1 << self.squares) - 1
+        self.bytes = (self.squares + 7) // 8
+        # a lane holds the own and the opponent stones of one version of a position
+        self.lane = 2 * self.squares
+        self.lane_mask = (1 << self.lane) - 1
+        self.square_images = [[self.turn_square(square, symmetry) for square in range(self.squares)]
+                              for symmetry in range(SYMMETRIES)]
+        self.square_inverses = [[0] * self.squares for _ in range(SYMMETRIES)]
+        for symmetry, images in enumerate(self.square_images):
+            for square, image in enumerate(images):
+                self.square_inverses[symmetry][image] = square
+        # images of every bit in all lanes, the bits past the board have none
+        bit_images = [sum(1 << (symmetry * self.lane + self.square_images[symmetry][square])
+                          for symmetry in range(SYMMETRIES)) if square < self.squares else 0
+                      for square in range(8 * self.bytes)]
+        self.tables = []
+        for index in range(self.bytes):
+            table = [0] * 256
+            for value in range(1, 256):
+                low = value & -value
+                table[value] = table[value ^ low] | bit_images[8 * index + low.bit_length() - 1]
+            self.tables.append(table)
+
+    def __reduce__(self):
+        # the tables are rebuilt rather than pickled
+        return board_symmetry, (self.size,)
+
+    def turn_square(self, square, symmetry):
+        last = self.size - 1
+        r, c = divmod(square, self.size)
+        if symmetry & 1:
+            c = last - c
+        if symmetry & 2:
+            r = last - r
+        if symmetry & 4:
+            r, c = c, r
+        return r * self.size + c
+
+    def spread(self, bb):
+        """ Images of the bitboard under all symmetries, symmetry s in the lane starting at bit s * lane """
+        images = 0
+        for table, value in zip(self.tables, bb.to_bytes(self.bytes, 'little')):
+            if value:
+                images |= table[value]
+        return images
+
+    def transform(self, bb, symmetry):
+        return (self.spread(bb) >> (symmetry * self.lane)) & self.full
+
+    def transform_square(self, square, symmetry):
+        return self.square_images[symmetry][square]
+
+    def inverse_square(self, square, symmetry):
+        """ Undoes transform_square """
+        return self.square_inverses[symmetry][square]
+
+    def canonical(self, own, opp):
+        """
+        The smallest of the symmetric versions of the position, compared as (own, opp)
+        :return: (own, opp, tuple of the symmetries that give it)
+        """
+        images = (self.spread(own) << self.squares) | self.spread(opp)
+        lane = self.lane
+        lane_mask = self.lane_mask
+        versions = [(images >> (symmetry * lane)) & lane_mask for symmetry in range(SYMMETRIES)]
+        best = min(versions)
+        symmetries = tuple(symmetry for symmetry, version in enumerate(versions) if version == best)
+        return best >> self.squares, best & self.full, symmetries
+
+
+_symmetries = {}
+_zobrists = {}
+
+
+def board_symmetry(size):
+    """ Shared BoardSymmetry instance for the board size """
+    tables = _symmetries.get(size)
+    if tables is None:
+        tables = _symmetries[size] = BoardSymmetry(size)
+    return tables
+
+
+def key_zobrist(size):
+    """ Zobrist keys of the canonical keys of the board size """
+    zobrist = _zobrists.get(size)
+    if zobrist is None:
+        zobrist = _zobrists[size] = Zobrist(size * size, KEY_SEED)
+    return zobrist
+
+
+def transform(bb, symmetry, size=8):
+    return board_symmetry(size).transform(bb, symmetry)
+
+
+def transform_square(square, symmetry, size=8):
+    return board_symmetry(size).square_images[symmetry][square]
+
+
+def inverse_square(square, symmetry, size=8):
+    """ Undoes transform_square """
+    return board_symmetry(size).square_inverses[symmetry][square]
+
+
+def canonical(own, opp, size=8):
+    """
+    The smallest of the symmetric versions of the position
+    :return: (own, opp, tuple of the symmetries that give it)
+    """
+    return _canonical(own, opp, size)
+
+
+def canonical_key(own, opp, size=8):
+    """ Hash of the canonical form of the position with own stones to move, the same for all symmetric positions """
+    return _canonical_key(own, opp, size)
+
+
+# the caches are reached with all the arguments positional only - lru_cache keys
+# canonical(own, opp) and canonical(own, opp, 8) apart and would keep both
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _canonical(own, opp, size):
+    return board_symmetry(size).canonical(own, opp)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _canonical_key(own, opp, size):
+    canonical_own, canonical_opp, symmetries = _canonical(own, opp, size)
+    return key_zobrist(size).hash_position((canonical_own, canonical_opp), 0)
+
+
+def canonical_move(own, opp, square, size=8):
+    """
+    Key of the position and the move in the canonical orientation.
+    Moves that are symmetric in a symmetric position share one canonical square.
+    """
+    images = board_symmetry(size).square_images
+    return canonical_key(own, opp, size), min(images[symmetry][square] for symmetry in canonical(own, opp, size)[2])
+
+
+def distinct_moves(own, opp, moves, size=8):
+    """
+    One move of every set of moves that are symmetric in a symmetric position - they lead to equal positions
+    :param moves: field indexes, the first move of every set is kept
+    :return: the moves, the same list if the position has no symmetry
+    """
+    symmetries = canonical(own, opp, size)[2]
+    if len(symmetries) == 1:
+        return moves
+    images = board_symmetry(size).square_images
+    seen = set()
+    distinct = []
+    for move in moves:
+        image = min(images[symmetry][move] for symmetry in symmetries)
+        if image not in seen:
+            seen.add(image)
+            distinct.append(move)
+    return distinct
@@ -0,0 +1,194 @@
+"""
+Tournament of reversi players played on all CPU cores.
+
+Every pairing is played with both color assignments. Run from the command line:
+
+>> python tournament.py player dummier greedy random_player
+>> python tournament.py -g 50 -j 4 --gauntlet player dummier greedy
+
+Options:
+    -g N         games of every pairing for each color assignment (default 10)
+    -j N         number of worker processes (default all cores)
+    -r FILE      append the record of every game to the file, a binary archive for names ending with .rga,
+                 JSON lines otherwise
+    -s N         board size, 6, 8, 10 or 12 (default 8)
+    --gauntlet   the first player plays everyone else, instead of everyone against everyone
+"""
+import getopt
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game_record import prepare_record_file
+from game_board import BOARD_SIZES
+from headless_reversi_creator import HeadlessReversiCreator, SILENT
+
+P1_COLOR = 0
+P2_COLOR = 1
+
+
+def play_single_game(job):
+    """
+    Plays one silent game in a worker process
+    :param job: (first player module name, second player module name, record path or None, board size),
+        the first one starts
+    :return: dict with the module names, final stones and the winner (0 first, 1 second, None draw)
+    """
+    first, second, record_path, board_size = job
+    p1 = __import__(first).MyPlayer(P1_COLOR, P2_COLOR)
+    p2 = __import__(second).MyPlayer(P2_COLOR, P1_COLOR)
+    game = HeadlessReversiCreator(p1, P1_COLOR, p2, P2_COLOR, board_size, SILENT, record_path)
+    try:
+        game.play_game()
+        failed_color = game.wrong_move_color
+    except Exception:
+        # a crashing player loses the game
+        failed_color = game.current_player_color
+    stones = game.board.get_score()
+    if failed_color is not None:
+        winner = 1 if failed_color == P1_COLOR else 0
+    elif stones[0] > stones[1]:
+        winner = 0
+    elif stones[1] > stones[0]:
+        winner = 1
+    else:
+        winner = None
+    return {'players': (first, second), 'stones': stones, 'winner': winner, 'forfeit': failed_color is not None}
+
+
+def pairings(players, gauntlet=False):
+    """ Pairs of players that meet, every pair once """
+    if gauntlet:
+        return [(players[0], other) for other in players[1:]]
+    return [(players[i], players[j]) for i in range(len(players)) for j in range(i + 1, len(players))]
+
+
+def schedule(players, games, gauntlet=False, record_path=None, board_size=8):
+    """ All games of the tournament - each pairing plays games times with each color assignment """
+    jobs = []
+    for a, b in pairings(players, gauntlet):
+        for _ in range(games):
+            jobs.append((a, b, record_path, board_size))
+            jobs.append((b, a, record_path, board_size))
+    return jobs
+
+
+def run_tournament(players, games=10, gauntlet=False, processes=None, progress=None, record_path=None,
+                   board_size=8):
+    """
+    Plays the tournament on a process pool
+    :param players: list of module names with the MyPlayer class
+    :param games: games of every pairing for each color assignment
+    :param gauntlet: the first player plays everyone else only
+    :param processes: number of worker processes, None for all cores
+    :param progress: function called with (finished games, all games) after every game
+    :param record_path: JSON lines file the record of every game is appended to
+    :param board_size: size of the board of all games
+    :return: list of game results as returned by play_single_game
+    """
+    if len(set(players)) != len(players):
+        raise ValueError('Every player can take part only once')
+    jobs = schedule(players, games, gauntlet, record_path, board_size)
+    prepare_record_file(record_path)
+    results = []
+    # not multiprocessing.Pool - its daemonic workers can not start the player processes
+    with ProcessPoolExecutor(processes) as pool:
+        for future in as_completed([pool.submit(play_single_game, job) for job in jobs]):
+            results.append(future.result())
+            if progress is not None:
+                progress(len(results), len(jobs))
+    return results
+
+
+def standings(results):
+    """
+    Sums the results for every player
+    :return: dict player -> dict with games, wins, draws, losses, forfeits and disc_diff
+    """
+    table = {}
+    for result in results:
+        for index, name in enumerate(result['players']):
+            row = table.setdefault(name, {'games': 0, 'wins': 0, 'draws': 0, 'losses': 0, 'forfeits': 0,
+                                          'disc_diff': 0})
+            row['games'] += 1
+            row['disc_diff'] += result['stones'][index] - result['stones'][1 - index]
+            if result['winner'] is None:
+                row['draws'] += 1
+            elif result['winner'] == index:
+                row['wins'] += 1
+            else:
+                row['losses'] += 1
+                if result['forfeit']:
+                    row['forfeits'] += 1
+    return table
+
+
+def elo_ratings(results, iterations=200):
+    """
+    Maximum likelihood Elo estimate (Bradley-Terry model, a draw counts as half a win).
+    Every pair gets one virtual draw, so unbeaten or winless players stay finite.
+    :return: dict player -> Elo rating, the average rating is 0
+    """
+    games = {}
+    points = {}
+    for result in results:
+        a, b = result['players']
+        pair = (a, b) if a < b else (b, a)
+        if pair not in games:
+            games[pair] = 1
+            points[pair[0]] = points.get(pair[0], 0) + 0.5
+            points[pair[1]] = points.get(pair[1], 0) + 0.5
+        games[pair] += 1
+        if result['winner'] is None:
+            points[a] += 0.5
+            points[b] += 0.5
+        else:
+            points[result['players'][result['winner']]] += 1
+    if not points:
+        return {}
+    strength = dict.fromkeys(points, 1.0)
+    for _ in range(iterations):
+        updated = {}
+        for player in strength:
+            denominator = 0.0
+            for (a, b), count in games.items():
+                if player == a or player == b:
+                    denominator += count / (strength[a] + strength[b])
+            updated[player] = points[player] / denominator
+        # keep the geometric mean at 1, only the ratios matter
+        norm = math.exp(sum(math.log(s) for s in updated.values()) / len(updated))
+        strength = dict((player, s / norm) for player, s in updated.items())
+    return dict((player, 400 * math.log10(s)) for player, s in strength.items())
+
+
+def print_standings(results):
+    table = standings(results)
+    ratings = elo_ratings(results)
+    print('%-20s %6s %6s %6s %6s %9s %7s' % ('player', 'games', 'wins', 'draws', 'losses', 'disc diff', 'elo'))
+    for name in sorted(table, key=lambda player: -ratings[player]):
+        row = table[name]
+        print('%-20s %6d %6d %6d %6d %+9d %+7.0f' % (name, row['games'], row['wins'], row['draws'], row['losses'],
+                                                    row['disc_diff'], ratings[name]))
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "g:j:r:s:", ["gauntlet"])
+    options = dict(choices)
+    if len(args) < 2:
+        print('At least two players are needed.')
+        sys.exit(1)
+    board_size = options.get('-s', '8')
+    if not board_size.isdigit() or int(board_size) not in BOARD_SIZES:
+        print('Unsupported board size: %s' % board_size)
+        print(__doc__)
+        sys.exit(2)
+
+    def report(done, total):
+        sys.stderr.write('\r%d/%d games' % (done, total))
+        if done == total:
+            sys.stderr.write('\n')
+
+    tournament_results = run_tournament(args, int(options.get('-g', 10)), '--gauntlet' in options,
+                                        int(options['-j']) if '-j' in options else None, report,
+                                        options.get('-r'), int(board_size))
+    print_standings(tournament_results)
@@ -0,0 +1,142 @@
+"""
+Zobrist hashing and a bounded transposition table for the alpha beta search.
+"""
+import itertools
+import random
+
+from bitboard import iter_squares
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1  # real score is at least the stored score (beta cut)
+UPPER = 2  # real score is at most the stored score (no move raised alpha)
+
+
+class Zobrist:
+    """Random keys for every (color, square) pair and for the side to move"""
+
+    def __init__(self, squares=64, seed=2017):
+        rng = random.Random(seed)
+        self.stones = [[rng.getrandbits(64) for _ in range(squares)] for _ in range(2)]
+        # flipping a stone from one color to the other xors both keys at once
+        self.flip = [a ^ b for a, b in zip(self.stones[0], self.stones[1])]
+        self.turn = rng.getrandbits(64)
+
+    def hash_position(self, stones, symbol):
+        """
+        Full hash of the position
+        :param stones: bitboards of color 0 and color 1
+        :param symbol: color to move, 0 or 1
+        """
+        key = self.turn if symbol == 1 else 0
+        for color in (0, 1):
+            keys = self.stones[color]
+            for square in iter_squares(stones[color]):
+                key ^= keys[square]
+        return key
+
+    def move_key(self, key, square, flipped, symbol):
+        """
+        Incremental hash after the move
+        :param key: hash before the move
+        :param square: index of the placed stone
+        :param flipped: bitboard of the flipped stones
+        :param symbol: color of the placed stone
+        :return: hash of the new position with the other side to move
+        """
+        key ^= self.stones[symbol][square] ^ self.turn
+        flip = self.flip
+        while flipped:
+            low = flipped & -flipped
+            key ^= flip[low.bit_length() - 1]
+            flipped ^= low
+        return key
+
+
+# oldest entries the 'shallow' eviction chooses from
+EVICTION_SAMPLE = 8
+
+
+class Entry:
+    """Result of one searched position"""
+    __slots__ = ('depth', 'score', 'bound', 'move', 'age')
+
+    def __init__(self, depth, score, bound, move, age):
+        self.depth = depth
+        self.score = score
+        self.bound = bound
+        self.move = move
+        self.age = age
+
+
+class TranspositionTable:
+    """
+    Bounded hash -> Entry map that lives as long as the player (across turns)
+
+    Replacement policies for a key that is already stored:
+        'depth'  - keep the deeper entry unless the stored one is from an older search
+        'always' - the newest result always wins
+    Eviction policies for a new key when the table is full:
+        'fifo'    - the oldest inserted entry goes
+        'shallow' - of the EVICTION_SAMPLE oldest inserted entries the one from the oldest search
+                    with the smallest depth goes, cheap entries make room before expensive ones
+    A table of size 0 stores nothing.
+    """
+
+    def __init__(self, max_entries=200000, policy='depth', eviction='fifo'):
+        if policy not in ('depth', 'always'):
+            raise ValueError('Unknown replacement policy: %s' % policy)
+        if eviction not in ('fifo', 'shallow'):
+            raise ValueError('Unknown eviction policy: %s' % eviction)
+        self.max_entries = max_entries
+        self.policy = policy
+        self.eviction = eviction
+        self.entries = {}
+        self.age = 0
+        self.hits = 0
+        self.probes = 0
+
+    def new_search(self):
+        """ Marks entries stored so far as old - called once per move """
+        self.age += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.age = 0
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def store(self, key, depth, score, bound, move):
+        entries = self.entries
+        entry = entries.get(key)
+        if entry is not None:
+            if self.policy == 'depth' and entry.depth > depth and entry.age == self.age:
+                return
+            entry.depth = depth
+            entry.score = score
+            entry.bound = bound
+            entry.move = move
+            entry.age = self.age
+            return
+        if len(entries) >= self.max_entries:
+            if self.max_entries <= 0:
+                return
+            self.evict()
+        entries[key] = Entry(depth, score, bound, move, self.age)
+
+    def evict(self):
+        entries = self.entries
+        if self.eviction == 'fifo':
+            del entries[next(iter(entries))]
+            return
+        candidates = itertools.islice(entries.items(), EVICTION_SAMPLE)
+        key = min(candidates, key=lambda item: (item[1].age, item[1].depth))[0]
+        del entries[key]
+
+    def __len__(self):
+        return len(self.entries)